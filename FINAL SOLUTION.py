@@ -1,145 +1,1817 @@
 # All Imports
-import websocket
+import time
+process_started = time.perf_counter()  # Reference point for the time-to-first-chunk report
+import asyncio
+import websockets
 import json
 import threading
-import time
 import random
+import re
 import math
+import mmap
+import multiprocessing
 import hashlib
+import functools
+import bisect
 import csv
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.asymmetric import rsa, padding
+import os
+import struct
+import tempfile
+import timeit
+import urllib.parse
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa, padding, ec, ed25519, utils
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+import numpy as np
+from array import array
+from collections import OrderedDict, deque
+from pathlib import Path
 from datetime import datetime
-import xlsxwriter
 
 # Defining Constants
 NUMBER_OF_NODES = 10 # Number of Nodes to Run
 FAULTY_PROPORTION = 1/3 # Proportion of nodes that will be Faulty
 NUMBER_OF_FAULTY_NODES = math.floor(NUMBER_OF_NODES * FAULTY_PROPORTION)
-CHUNK_SIZE = 500  # Chunk Size
-BUFFER_CHECK_FREQUENCY = 5  # Seconds
-NUMBER_OF_SEGMENTS = 5  # Define the number of segments per chunk
-TOTAL_VOTES = NUMBER_OF_NODES * (NUMBER_OF_SEGMENTS + 2) # Helps Approval Algorithm
-MIN_APPROVALS = 2 * (TOTAL_VOTES // 3) + 1 # Determines Threshhold to Pass
-SEGMENT_LENGTH = 20 
-NUMBER_OF_CHUNKS = 3    # Define the number of chunks to process
-DATA_BUFFER = ""  # Initializing Data Buffer
-exit_flag = False  # Flag for Graceful Exit
+FAULT_MODEL = "random"  # How faulty nodes vote: "random" (coin flip per segment), "reject" (always False) or "approve" (always True)
+VOTING_ENGINE = "per_node"  # "per_node" (nodes vote one after another), "parallel" (concurrently, with a deadline) or "bulk" (whole registry at once, for 10k+ nodes)
+NODE_VOTE_WORKERS = 16  # Threads computing votes in the "parallel" voting engine; node delays are waited out on an event loop, not in these threads
+VOTE_DEADLINE = 0.5  # Seconds a chunk waits for node votes in the "parallel" engine; later nodes abstain
+NODE_LATENCY_MEAN = 0.0  # Mean simulated response delay per node vote (exponentially distributed), in seconds
+SLOW_NODE_PROPORTION = 0.0  # Proportion of nodes (the highest ids) that are slow
+SLOW_NODE_FACTOR = 20  # Latency multiplier for slow nodes
+NODE_DETAIL_LIMIT = 100  # Nodes listed per chunk in the terminal report and matrix table; the tally always covers every node
+CHUNK_SIZE = 500  # Chunk Size in bytes for the "prices" chunk format
+CHUNK_FORMAT = "prices"  # "prices" (concatenated price strings) or "trades" (packed columnar trade batches)
+TRADES_PER_CHUNK = 16  # Whole trades per chunk in the "trades" chunk format
+FIXED_POINT_SCALE = 10**8  # Prices and quantities are stored as integers in units of 1e-8
+FAST_TRADE_DECODER = True  # Scan trade frames for the needed fields instead of a full json.loads
+BUFFER_CHECK_FREQUENCY = 5  # Seconds between "waiting for data" notices
+NUMBER_OF_SEGMENTS = 5  # Define the number of middle segments per chunk for "head_tail" segmentation
+SEGMENT_EDGE_LENGTH = 50  # Bytes in the head and tail segments
+SEGMENT_LENGTH = 20  # Bytes per sample or tile for "sampled_*" and "tiled" segmentation, and the shortest "content_defined" segment
+SEGMENT_AVERAGE_LENGTH = 64  # Target average "content_defined" segment in bytes (a power of two)
+SEGMENT_MAX_LENGTH = 128  # Longest "content_defined" segment in bytes
+SEGMENT_SIZES = "scaled"  # "scaled" (the lengths above, sized for CHUNK_SIZE chunks) or "prototype" ("sampled_*" and "tiled" use the prototypes' 500-byte edges, 100-byte samples and 50-byte tiles, for FILE_CHUNK_SIZE chunks; plans wider than the matrix table are rejected at start-up)
+SEGMENTATION_STRATEGY = "head_tail"  # "head_tail", "sampled_7_5", "sampled_20", "tiled" or "content_defined"
+CHUNKING = "fixed"  # "fixed" (CHUNK_SIZE bytes) or "content_defined" (rolling-hash boundaries, "prices" format only)
+CDC_MIN_CHUNK = 256  # Smallest content-defined chunk in bytes
+CDC_AVERAGE_CHUNK = 512  # Target average content-defined chunk in bytes (a power of two)
+CDC_MAX_CHUNK = 1024  # Largest content-defined chunk in bytes; also the ring buffer slot size
+SIGNATURE_SCHEME = "rsa_pss"  # "rsa_pss" (RSA-2048 PSS), "ed25519" or "ecdsa_p256"
+KEYSTORE_DIR = 'keystore'  # Signing keys are generated here on the first run and loaded on later runs
+SIGNING_MODE = "per_segment"  # "per_segment" (one RSA signature per segment) or "merkle_root" (one per chunk, with inclusion proofs)
+REUSE_SIGNATURES = False  # Reuse the signature of any segment hash (or Merkle root) that was already signed
+SIGNATURE_CACHE_SIZE = 4096  # Segment signatures kept for reuse
+VERIFICATION_MODE = "shared"  # "shared" (first honest node's signature check is reused) or "independent" (every node verifies)
+VERIFICATION_CACHE_SIZE = 65536  # Signature check results kept in "shared" verification mode
+EARLY_TERMINATION = False  # Stop collecting votes on a chunk as soon as its outcome can no longer change
+AUDIT_VOTES = False  # With EARLY_TERMINATION, still collect the full vote matrix and only record what would be skipped
+BULK_VOTE_BLOCK = 1024  # Nodes the "bulk" voting engine evaluates per step with EARLY_TERMINATION
+CRYPTO_EXECUTOR = None  # None (sign and verify inline), "process" (process pool) or "thread" (thread pool)
+CRYPTO_WORKERS = os.cpu_count() or 1  # Workers in the crypto executor pool
+CRYPTO_BATCH_SIZE = 16  # Digests signed or checked per pool task, to amortize the hand-off cost
+CRYPTO_MIN_BATCH_SIZE = 4  # Smallest batch work is split into to reach idle workers; below it the hand-off costs more than it saves
+CONSENSUS_COMMIT = None  # None, or "pbft" to also commit every verified chunk through a local PBFT replica cluster
+PBFT_REPLICAS = 4  # Replicas in the local PBFT cluster; tolerates (n - 1) // 3 faulty replicas
+PBFT_HOST = "127.0.0.1"  # Replicas listen on ephemeral ports on this address
+PBFT_CRASHED_REPLICAS = ()  # Replica ids that stay silent, e.g. (0,) to force a round change away from the first primary
+PBFT_VIEW_TIMEOUT = 1.0  # Seconds a replica waits for a pending request to commit before starting a round change
+PBFT_CHECKPOINT_INTERVAL = 16  # Sequence numbers between checkpoints, which let replicas discard their logs
+PBFT_LOG_WINDOW = 64  # Sequence numbers the primary may assign beyond the last stable checkpoint
+PBFT_COMMIT_TIMEOUT = 30  # Seconds a chunk waits for the cluster to commit it before it is reported as not committed
+PBFT_BENCHMARK_REPLICAS = (4, 7, 10, 13, 16)  # Cluster sizes compared by the "pbft" benchmark
+PBFT_BENCHMARK_CHUNKS = 50  # Chunk digests committed per cluster size by the "pbft" benchmark
+PBFT_PIPELINE_DEPTH = 8  # Chunks in flight at once in the benchmark's throughput run
+NUMBER_OF_CHUNKS = 3    # Define the number of chunks to process per live stream (recordings and files are processed whole)
+BUFFER_CAPACITY_CHUNKS = 16  # Chunk slots preallocated in the ring buffer
+OVERFLOW_POLICY = "drop_oldest"  # When the ring buffer is full: "block", "drop_oldest" or "spill" (to a temp file); finite sources always block
+INGESTION_ENGINE = "asyncio"  # "asyncio" (single event loop) or "thread" (websocket-client on its own thread)
+RECONNECT_DELAY = 5  # Seconds to wait before reconnecting a dropped exchange stream
+MULTI_SYMBOL_MODE = False  # Verify every pair in SYMBOLS over one combined stream
+SYMBOLS = ["btcusdt", "ethusdt", "bnbusdt", "solusdt", "xrpusdt"]  # Only the first is used in single-symbol mode
+DISPATCH_WORKERS = 4  # Consensus worker threads shared by all symbol pipelines
+DATA_SOURCE = "exchange"  # Where data comes from: "exchange", "replay", "file", "kafka" or "mmap"
+RECORD_FEED_TO = None  # Append every raw frame received to this log file, e.g. 'feed_recording.bin'
+REPLAY_FROM = 'feed_recording.bin'  # Recorded log read by the "replay" source
+REPLAY_SPEED = 1  # 1 = real time, N = N times faster, 0 = as fast as possible
+FRAMES_FILE = 'trade_frames.jsonl'  # One JSON frame per line, read by the "file" source
+FINITE_SOURCES = ("replay", "file")  # Sources that end on their own; their streams are verified whole
+MAPPED_FILE = 'large_file.html'  # File verified by the "mmap" source, e.g. from GeneratingLargeSizeFileForTesting.py
+FILE_CHUNK_SIZE = 1024 * 1024  # Chunk size in bytes for the "mmap" source
+KAFKA_CONFIG = {
+    'bootstrap.servers': 'in-process',  # "in-process" uses the local broker stand-in fed with synthetic trades
+    'group.id': 'cryptobang-consumer-group',
+    'auto.offset.reset': 'earliest'
+}
+KAFKA_TOPIC = 'binance-trades'
+KAFKA_POLL_TIMEOUT = 1.0  # Seconds to wait for a Kafka message
+WINDOW_SECONDS = 10  # Length of the recent-data window kept by the Kafka source
+WINDOW_REPORT_INTERVAL = 2  # Seconds between recent-data window reports
+BINANCE_WS_BASE = "wss://stream.binance.com:9443"  # Exchange stream endpoint
+SYNTHETIC_EXCHANGE = None  # None, "embedded" (serve a local stand-in and ingest from it) or "serve" (server only)
+SYNTHETIC_HOST = "localhost"
+SYNTHETIC_PORT = 8765
+SYNTHETIC_RATE = 1000  # Trade messages per second per connection (up to ~100k)
+SYNTHETIC_BURST_PATTERN = "steady"  # "steady", "square" (alternating high/low halves) or "spike" (short bursts)
+SYNTHETIC_BURST_PERIOD = 1.0  # Seconds per burst cycle
+SYNTHETIC_BURST_FACTOR = 5  # Rate multiplier during the high part of a burst cycle
+SYNTHETIC_LATENCY = 0.0  # Seconds each frame spends "on the wire" before delivery
+SYNTHETIC_LATENCY_JITTER = 0.0  # Extra random delivery delay, 0..jitter seconds
+SYNTHETIC_DROP_RATE = 0.0  # Fraction of frames silently dropped (trade ids still advance)
+SYNTHETIC_TICK = 0.001  # Seconds between frame batches
+BENCHMARK = None  # Run a benchmark instead of the pipeline: "decoder", "segmentation", "signatures", "crypto_executor", "crypto_context", "node_scale" or "pbft"
+BENCHMARK_FRAMES_FROM = 'feed_recording.bin'  # Recorded frames for benchmarks; synthetic frames if missing
+BENCHMARK_FRAME_COUNT = 100000  # Synthetic frames generated when no recording is available
+exit_event = threading.Event()  # Set for Graceful Exit
+shutdown_callbacks = []  # Called from request_shutdown so blocking loops can wake up
 
-# Defining global workbook and worksheet for matrix data
-workbook = xlsxwriter.Workbook('matrix_tables.xlsx')
-worksheet = workbook.add_worksheet()
+# Global workbook for matrix data, created with the other output files once the first chunk is verified;
+# each symbol pipeline adds its own worksheet
+workbook = None
+workbook_lock = threading.Lock()  # Worksheets share the workbook's string table, so writes are serialized
+MATRIX_TABLE_MAX_COLUMNS = 16384  # Excel's sheet width; XlsxWriter silently drops anything written past it
 
-# Add headers to the matrix data file
-headers = ['CHUNK #', 'NODE #','HEAD', 'SEG 1', 'SEG 2', 'SEG 3', 'SEG 4', 'SEG 5', 'TAIL',
-           'PERCENTAGE', 'OUTCOME','SIZE', 'HASHES',
-           'SIGNATURE', 'TIMESTAMP', 'STATUS']
+# Function to build the matrix data file headers for a number of segments per chunk
+def matrix_headers(segment_count):
+    segment_headers = ['HEAD'] + [f'SEG {i}' for i in range(1, segment_count - 1)] + ['TAIL']
+    return (['CHUNK #', 'NODE #'] + segment_headers +
+            ['PERCENTAGE', 'OUTCOME', 'SIZE', 'HASHES', 'SIGNATURE', 'TIMESTAMP', 'STATUS'])
 
-# Write headers to the worksheet
-for col_num, header in enumerate(headers):
-    worksheet.write(0, col_num, header)
+# Signature Schemes
+# Each scheme signs and verifies 32-byte digests (segment hashes or Merkle roots); verify raises on a bad signature.
+# A scheme instance is the crypto context: its padding and hash objects are built once at start-up and reused
+# by every call, and digests are passed as Prehashed SHA-256 so a segment is hashed exactly once, not re-hashed
+# inside the signature operation.
 
-# Start row for the first chunk
-start_row = 1 
+# RSA-2048 with PSS padding, the final solution's original scheme
+class RSAPSSScheme:
+    def __init__(self):
+        self.padding = padding.PSS(
+            mgf=padding.MGF1(hashes.SHA256()),
+            salt_length=padding.PSS.MAX_LENGTH
+        )
+        self.algorithm = utils.Prehashed(hashes.SHA256())
 
-# Write headers to the worksheet, across the first row
-for col_num, header in enumerate(headers):
-    worksheet.write(0, col_num, header)
+    def generate_private_key(self):
+        return rsa.generate_private_key(public_exponent=65537, key_size=2048)
 
-# Generate RSA keys (private and public)
-private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
-public_key = private_key.public_key()
+    def sign(self, private_key, digest):
+        return private_key.sign(digest, self.padding, self.algorithm)
 
+    def verify(self, public_key, signature, digest):
+        public_key.verify(signature, digest, self.padding, self.algorithm)
 
+# Ed25519, as used by Wallet and ChainUtil in the Byzantine prototype (pure Ed25519 has no prehashed form,
+# so the 32-byte digest is the signed message)
+class Ed25519Scheme:
+    def generate_private_key(self):
+        return ed25519.Ed25519PrivateKey.generate()
 
-# File Initializations
-csv_filename = 'chunk_data_records.csv'
-with open(csv_filename, 'w', newline='') as file:
-    writer = csv.writer(file)
-    writer.writerow(["CHUNK #", "TIMESTAMP", "DATA", "SIZE", "SIGNATURE", "OUTCOME", "PERCENTAGE"])
+    def sign(self, private_key, digest):
+        return private_key.sign(digest)
 
+    def verify(self, public_key, signature, digest):
+        public_key.verify(signature, digest)
 
-# Node Class
-class Node:
-    def __init__(self, node_id, is_faulty):
-        self.node_id = node_id
-        self.is_faulty = is_faulty
+# ECDSA over NIST P-256 with SHA-256
+class ECDSAP256Scheme:
+    def __init__(self):
+        self.algorithm = ec.ECDSA(utils.Prehashed(hashes.SHA256()))
 
-    def vote(self, segment, segment_hash, public_key, signature, timestamp):
-        if self.is_faulty:
-            return random.choice([True, False])
+    def generate_private_key(self):
+        return ec.generate_private_key(ec.SECP256R1())
 
-        calculated_hash = hashlib.sha256(segment.encode()).hexdigest()
-        if calculated_hash != segment_hash:
-            return False
+    def sign(self, private_key, digest):
+        return private_key.sign(digest, self.algorithm)
 
-        try:
-            public_key.verify(
-                signature,
-                calculated_hash.encode(),
-                padding.PSS(
-                    mgf=padding.MGF1(hashes.SHA256()),
-                    salt_length=padding.PSS.MAX_LENGTH
-                ),
-                hashes.SHA256()
-            )
-        except Exception:
-            return False
+    def verify(self, public_key, signature, digest):
+        public_key.verify(signature, digest, self.algorithm)
 
-        if datetime.now().timestamp() - timestamp > 300:
-            return False
+SIGNATURE_SCHEMES = {"rsa_pss": RSAPSSScheme, "ed25519": Ed25519Scheme, "ecdsa_p256": ECDSAP256Scheme}
 
+# Crypto context and keys (private and public) for the configured scheme, set up by load_crypto on first use
+signature_scheme = None
+private_key = None
+public_key = None
+crypto_ready_at = None
+
+# Function to load the signing key for a scheme from the keystore, generating and saving it on the first run
+def load_or_create_private_key(scheme, scheme_name):
+    key_path = Path(KEYSTORE_DIR) / f"{scheme_name}_private_key.pem"
+    if key_path.exists():
+        return serialization.load_pem_private_key(key_path.read_bytes(), password=None)
+
+    key = scheme.generate_private_key()
+    key_path.parent.mkdir(parents=True, exist_ok=True)
+    key_bytes = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption())
+    with os.fdopen(os.open(key_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'wb') as file:  # Owner-only, unencrypted
+        file.write(key_bytes)
+    print(f"Generated a new {scheme_name} signing key in {key_path}")
+    return key
+
+# Function to set up the crypto context and keys once, before the first signature is needed
+def load_crypto():
+    global signature_scheme, private_key, public_key, crypto_ready_at
+    if signature_scheme is None:
+        signature_scheme = SIGNATURE_SCHEMES[SIGNATURE_SCHEME]()
+        private_key = load_or_create_private_key(signature_scheme, SIGNATURE_SCHEME)
+        public_key = private_key.public_key()
+        crypto_ready_at = time.perf_counter()
+
+# Function to identify a public key by a hash of its DER encoding
+def public_key_id(public_key):
+    key_bytes = public_key.public_bytes(serialization.Encoding.DER, serialization.PublicFormat.SubjectPublicKeyInfo)
+    return hashlib.sha256(key_bytes).digest()[:16]
+
+# Shared by every chunk assembler so one pool of dispatchers can wait on all symbols at once
+chunk_ready = threading.Condition()
+
+# Chunk Assembler Class
+# Assembles the incoming byte stream into CHUNK_SIZE chunks inside one preallocated bytearray.
+# With a content-defined chunker, a chunk ends where the chunker finds a boundary in the content
+# instead, so chunks vary in length and chunk_size is the largest one a slot can hold.
+# The bytearray is split into fixed chunk slots that are recycled ring-style, so memory stays
+# flat no matter how far ingestion runs ahead of consensus. Finished chunks are handed out as
+# zero-copy memoryviews over their slot and must be released once processing is done.
+# A condition variable wakes the dispatcher the moment a chunk completes. When every slot is
+# taken, the overflow policy decides whether the producer blocks, the oldest waiting chunk is
+# dropped, or the new chunk is spilled to a temporary file and read back in order later.
+class ChunkAssembler:
+    def __init__(self, chunk_size, capacity_chunks, condition=None, overflow_policy="drop_oldest", chunker=None):
+        self.chunk_size = chunk_size
+        self.capacity_chunks = capacity_chunks
+        self.overflow_policy = overflow_policy
+        self.chunker = chunker
+        self._rolling_hash = 0
+        self._storage = bytearray(chunk_size * capacity_chunks)
+        self._view = memoryview(self._storage)
+        self._free_slots = deque(range(1, capacity_chunks))
+        self._ready = deque()  # Completed chunks, oldest first, as (slot, spill_offset, length, completed_at)
+        self._write_slot = 0
+        self._write_offset = 0
+        self._chunk_ready = condition or threading.Condition()
+        self._closed = False
+        self._spill_file = None
+        self._spill_end = 0
+        self._spilled_waiting = 0
+
+        # Counters
+        self.max_depth = 0
+        self.dropped_chunks = 0
+        self.spilled_chunks = 0
+        self.blocked_seconds = 0.0  # Time the producer spent waiting under the "block" policy
+
+    def _slot_view(self, slot):
+        start = slot * self.chunk_size
+        return self._view[start:start + self.chunk_size]
+
+    # Called with the lock held when the write slot is full; returns False if the data should be discarded
+    def _complete_write_slot(self, length):
+        completed_at = time.perf_counter()
+        if self._free_slots:
+            self._ready.append((self._write_slot, None, length, completed_at))
+            self._write_slot = self._free_slots.popleft()
+        elif self.overflow_policy == "block":
+            self._ready.append((self._write_slot, None, length, completed_at))
+            self._chunk_ready.notify_all()
+            wait_start = time.perf_counter()
+            self._chunk_ready.wait_for(lambda: self._free_slots or self._closed)
+            self.blocked_seconds += time.perf_counter() - wait_start
+            if not self._free_slots:
+                return False
+            self._write_slot = self._free_slots.popleft()
+        elif self.overflow_policy == "spill":
+            # Park the new chunk on disk and keep filling the same slot
+            if self._spill_file is None:
+                self._spill_file = tempfile.TemporaryFile()
+            self._spill_file.seek(self._spill_end)
+            self._spill_file.write(self._slot_view(self._write_slot)[:length])
+            self._ready.append((None, self._spill_end, length, completed_at))
+            self._spill_end += length
+            self._spilled_waiting += 1
+            self.spilled_chunks += 1
+        else:
+            # Recycle the oldest waiting in-memory chunk rather than grow
+            for index, (slot, _, _, _) in enumerate(self._ready):
+                if slot is not None:
+                    del self._ready[index]
+                    self._ready.append((self._write_slot, None, length, completed_at))
+                    self._write_slot = slot
+                    self.dropped_chunks += 1
+                    break
+            else:
+                self.dropped_chunks += 1  # Every other slot is leased: the new chunk is overwritten
+        self.max_depth = max(self.max_depth, len(self._ready))
+        self._chunk_ready.notify()
         return True
 
+    # Producer side; only the producer touches the write slot, write offset and rolling hash
+    def append(self, data):
+        data = memoryview(data)
+        while data and not self._closed:
+            # Copy as much as fits into the slot currently being filled, up to a content boundary if there is one.
+            # The byte-by-byte boundary scan runs before taking the lock every dispatcher shares.
+            take = min(len(data), self.chunk_size - self._write_offset)
+            cut = None
+            if self.chunker is not None:
+                cut, self._rolling_hash = self.chunker.find_cut(data[:take], self._write_offset, self._rolling_hash)
+                take = cut or take
+            with self._chunk_ready:
+                if self._closed:
+                    return
+                start = self._write_slot * self.chunk_size + self._write_offset
+                self._view[start:start + take] = data[:take]
+                self._write_offset += take
+                if self._write_offset == self.chunk_size or cut:
+                    length, self._write_offset = self._write_offset, 0
+                    if not self._complete_write_slot(length):
+                        return
+            data = data[take:]
+
+    def ready_chunks(self):
+        return len(self._ready)
+
+    # Returns (slot, memoryview, completed_at) for the oldest complete chunk, or None if no chunk is ready.
+    # Spilled chunks are read back into a private buffer and come with slot None.
+    def pop_chunk(self):
+        with self._chunk_ready:
+            if not self._ready:
+                return None
+            slot, spill_offset, length, completed_at = self._ready.popleft()
+            if slot is not None:
+                return slot, self._slot_view(slot)[:length], completed_at
+
+            chunk = bytearray(length)
+            self._spill_file.seek(spill_offset)
+            self._spill_file.readinto(chunk)
+            self._spilled_waiting -= 1
+            if self._spilled_waiting == 0:
+                # Spill backlog drained: reuse the file from the start
+                self._spill_file.truncate(0)
+                self._spill_end = 0
+            return None, memoryview(chunk), completed_at
+
+    def release(self, slot):
+        if slot is None:
+            return
+        with self._chunk_ready:
+            self._free_slots.append(slot)
+            self._chunk_ready.notify_all()
+
+    # Stops accepting data and wakes a producer blocked on a full buffer
+    def close(self):
+        with self._chunk_ready:
+            self._closed = True
+            self._chunk_ready.notify_all()
+            if self._spill_file is not None:
+                self._spill_file.close()
+
+    def stats(self):
+        with self._chunk_ready:
+            return {'depth': len(self._ready), 'max_depth': self.max_depth, 'dropped': self.dropped_chunks,
+                    'spilled': self.spilled_chunks, 'blocked_seconds': self.blocked_seconds}
+
+# Function to parse a decimal string such as "42000.12000000" into a FIXED_POINT_SCALE integer without going through float
+def to_fixed_point(value):
+    whole, _, fraction = value.partition('.')
+    return int(whole) * FIXED_POINT_SCALE + int((fraction + '00000000')[:8])
+
+def from_fixed_point(value):
+    return f"{value // FIXED_POINT_SCALE}.{value % FIXED_POINT_SCALE:08d}"
+
+# Trade Batch Class
+# Decoded trades in columnar form: one int64 array each for trade id, event time (ms), price and
+# quantity (fixed point). A full batch is packed as the four columns back to back, so every chunk
+# holds whole trades and can be unpacked again by downstream consumers.
+TRADE_COLUMNS = ('trade_id', 'event_time', 'price', 'quantity')
+TRADE_RECORD_SIZE = 8 * len(TRADE_COLUMNS)
+
+class TradeBatch:
+    def __init__(self):
+        self.trade_id = array('q')
+        self.event_time = array('q')
+        self.price = array('q')
+        self.quantity = array('q')
+
+    def __len__(self):
+        return len(self.trade_id)
+
+    def append(self, trade_id, event_time, price, quantity):
+        self.trade_id.append(trade_id)
+        self.event_time.append(event_time)
+        self.price.append(price)
+        self.quantity.append(quantity)
+
+    def pack(self):
+        return b''.join(getattr(self, column).tobytes() for column in TRADE_COLUMNS)
+
+    def clear(self):
+        for column in TRADE_COLUMNS:
+            del getattr(self, column)[:]
+
+    @classmethod
+    def unpack(cls, data):
+        batch = cls()
+        column_size = len(data) // len(TRADE_COLUMNS)
+        for index, column in enumerate(TRADE_COLUMNS):
+            getattr(batch, column).frombytes(data[index * column_size:(index + 1) * column_size])
+        return batch
+
+# Function to render chunk bytes as text for the CSV records
+def format_chunk_data(chunk_data):
+    if CHUNK_FORMAT == "trades":
+        batch = TradeBatch.unpack(chunk_data)
+        return ';'.join(f"{trade_id},{event_time},{from_fixed_point(price)},{from_fixed_point(quantity)}"
+                        for trade_id, event_time, price, quantity in zip(batch.trade_id, batch.event_time, batch.price, batch.quantity))
+    return bytes(chunk_data).decode()
+
+# Content-Defined Chunking
+# Fixed boundaries mean one inserted trade shifts every later byte, so no chunk or segment hash ever
+# repeats. A Gear rolling hash instead places a boundary wherever the hash of the last 64 bytes has
+# its top bits clear, so boundaries follow the content and resynchronize right after an edit:
+# repeated price runs cut into identical pieces whose hashes (and signatures) can be reused.
+gear_random = random.Random(0x47656172)  # Fixed seed: every node must cut identically
+GEAR_TABLE = tuple(gear_random.getrandbits(64) for _ in range(256))
+GEAR_HASH_MASK = (1 << 64) - 1
+
+# Gear Chunker Class
+class GearChunker:
+    def __init__(self, min_length, average_length, max_length):
+        self.min_length = min_length
+        self.max_length = max_length
+        self.boundary_shift = 64 - (average_length.bit_length() - 1)  # One cut per average_length bytes on average
+
+    # Scans bytes that continue a piece already `length` bytes long. Returns (cut, rolling_hash) where cut is
+    # the number of bytes of data that complete the piece, or None if the piece runs past the end of data.
+    def find_cut(self, data, length, rolling_hash):
+        for index, byte in enumerate(data, start=1):
+            rolling_hash = ((rolling_hash << 1) + GEAR_TABLE[byte]) & GEAR_HASH_MASK
+            length += 1
+            if length >= self.max_length or (length >= self.min_length and rolling_hash >> self.boundary_shift == 0):
+                return index, 0
+        return None, rolling_hash
+
+    # Splits a whole buffer into (start, end) offsets; the last piece ends at the end of the buffer
+    def cut_points(self, data):
+        plan = []
+        start = 0
+        while start < len(data):
+            cut, _ = self.find_cut(data[start:], 0, 0)
+            end = start + cut if cut else len(data)
+            plan.append((start, end))
+            start = end
+        return tuple(plan)
+
+    # Most pieces a buffer of this length can be cut into
+    def max_pieces(self, data_length):
+        return max(-(-data_length // self.min_length), 1)
+
+# Bounded Cache Class
+# Thread-safe LRU map that evicts its least recently used entry once full, with hit/miss counters
+class BoundedCache:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # Returns the cached value, or None if the key is not cached
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+signature_cache = BoundedCache(SIGNATURE_CACHE_SIZE)  # Segment hash or Merkle root -> signature, so identical segments are signed once
+verification_cache = BoundedCache(VERIFICATION_CACHE_SIZE)  # (signed digest, signature, key id) -> signature check result
+
+# Segmentation Strategies
+# A strategy turns a chunk length into a tuple of (start, end) byte offsets, head segment first and tail
+# segment last. Plans depend only on the length, so segment_offset_plan computes each one once and
+# every later chunk of that size reuses it.
+
+# Final solution scheme: fixed head and tail plus equal middle segments covering the rest of the chunk
+class HeadTailSegmentation:
+    def __init__(self, edge_length, middle_segments):
+        self.edge_length = edge_length
+        self.middle_segments = middle_segments
+
+    def plan(self, chunk_length):
+        head_end = min(self.edge_length, chunk_length)
+        tail_start = max(chunk_length - self.edge_length, 0)
+        segment_length = max(tail_start - head_end, 0) // self.middle_segments
+        middle = [(head_end + index * segment_length, head_end + (index + 1) * segment_length) for index in range(self.middle_segments)]
+        return ((0, head_end), *middle, (tail_start, chunk_length))
+
+# HashTablesVerification SEGMENTATION.py / ByzantineandDHTs.py scheme: head and tail plus one short
+# sample at every fixed fraction of the chunk. The prototypes take 500-character edges and 100-character
+# samples, which would swallow a whole 500-byte chunk, so by default the lengths are scaled down to
+# SEGMENT_EDGE_LENGTH and SEGMENT_LENGTH; SEGMENT_SIZES = "prototype" restores the original lengths.
+class SampledSegmentation:
+    def __init__(self, edge_length, sample_length, interval_fraction):
+        self.edge_length = edge_length
+        self.sample_length = sample_length
+        self.interval_fraction = interval_fraction
+
+    def plan(self, chunk_length):
+        head_end = min(self.edge_length, chunk_length)
+        tail_start = max(chunk_length - self.edge_length, 0)
+        interval = max(int(chunk_length * self.interval_fraction), 1)
+        samples = [(start, min(start + self.sample_length, chunk_length)) for start in range(head_end, tail_start, interval)]
+        return ((0, head_end), *samples, (tail_start, chunk_length))
+
+# Websocket SegmentedHashVerification.py scheme: the whole chunk tiled into fixed-length pieces (50 bytes
+# in the prototype, SEGMENT_LENGTH when scaled)
+class TiledSegmentation:
+    def __init__(self, tile_length):
+        self.tile_length = tile_length
+
+    def plan(self, chunk_length):
+        return tuple((start, min(start + self.tile_length, chunk_length)) for start in range(0, max(chunk_length, 1), self.tile_length))
+
+# (edge, sample, tile) lengths for the prototype schemes
+PROTOTYPE_SEGMENT_SIZES = {"scaled": (SEGMENT_EDGE_LENGTH, SEGMENT_LENGTH, SEGMENT_LENGTH), "prototype": (500, 100, 50)}
+sampled_edge_length, sample_length, tile_length = PROTOTYPE_SEGMENT_SIZES[SEGMENT_SIZES]
+
+SEGMENTATION_STRATEGIES = {
+    "head_tail": HeadTailSegmentation(SEGMENT_EDGE_LENGTH, NUMBER_OF_SEGMENTS),
+    "sampled_7_5": SampledSegmentation(sampled_edge_length, sample_length, 7.5 / 100),
+    "sampled_20": SampledSegmentation(sampled_edge_length, sample_length, 20 / 100),
+    "tiled": TiledSegmentation(tile_length),
+    "content_defined": GearChunker(SEGMENT_LENGTH, SEGMENT_AVERAGE_LENGTH, SEGMENT_MAX_LENGTH),  # Plans depend on content, so they are not cached
+}
+
+# Function to get the cached offset plan of a strategy for a chunk length
+@functools.lru_cache(maxsize=None)
+def segment_offset_plan(strategy_name, chunk_length):
+    return SEGMENTATION_STRATEGIES[strategy_name].plan(chunk_length)
+
+# Function to get the (start, end) offsets of a chunk's segments under the configured strategy
+def chunk_segment_plan(data):
+    strategy = SEGMENTATION_STRATEGIES[SEGMENTATION_STRATEGY]
+    if isinstance(strategy, GearChunker):
+        return strategy.cut_points(data)
+    return segment_offset_plan(SEGMENTATION_STRATEGY, len(data))
+
+# Function to give the most segments a chunk of this length can have, for the matrix table columns
+def max_segment_count(chunk_length):
+    strategy = SEGMENTATION_STRATEGIES[SEGMENTATION_STRATEGY]
+    if isinstance(strategy, GearChunker):
+        return strategy.max_pieces(chunk_length)
+    return len(segment_offset_plan(SEGMENTATION_STRATEGY, chunk_length))
+
+# Function to give the number of True votes a chunk needs to pass
+def min_approvals(total_votes):
+    return 2 * (total_votes // 3) + 1
+
+# Mapped File Chunks Class
+# Takes the place of a pipeline's ChunkAssembler when verifying a file. The file is memory-mapped and
+# every chunk is a read-only memoryview straight into the mapping, keyed by its byte offset, so
+# segments are hashed from the page cache without copying, decoding or holding the file in memory.
+# The last chunk may be shorter than chunk_size.
+class MappedFileChunks:
+    def __init__(self, filename, chunk_size):
+        self.filename = filename
+        self.chunk_size = chunk_size
+        with open(filename, 'rb') as file:
+            self.size = os.fstat(file.fileno()).st_size
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b''
+        self._view = memoryview(self._map)
+        self.total_chunks = -(-self.size // chunk_size)
+        self._next_offset = 0
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def ready_chunks(self):
+        if self._closed:
+            return 0
+        return -(-(self.size - self._next_offset) // self.chunk_size)
+
+    # Returns (offset, memoryview, ready_at) for the next chunk of the file, or None at the end
+    def pop_chunk(self):
+        with self._lock:
+            if self._closed or self._next_offset >= self.size:
+                return None
+            offset = self._next_offset
+            self._next_offset += self.chunk_size
+        return offset, self._view[offset:offset + self.chunk_size], time.perf_counter()
+
+    def release(self, offset):
+        pass  # The mapping is read-only and shared; nothing to recycle
+
+    # Stops handing out chunks and unmaps the file. While a dispatcher still holds views into a chunk the
+    # mapping cannot be closed; it is then kept until close() is called again once the dispatchers are done.
+    def close(self):
+        with self._lock:
+            self._closed = True
+            if self._map is None:
+                return
+            self._view.release()
+            if self.size:
+                try:
+                    self._map.close()
+                except BufferError:
+                    return
+            self._map = None
+
+    def stats(self):
+        return {'depth': self.ready_chunks(), 'max_depth': self.total_chunks, 'dropped': 0, 'spilled': 0, 'blocked_seconds': 0.0}
+
+# Symbol Pipeline Class
+# Per-symbol chunk state: its own assembler, chunk counter and output partition (CSV file and worksheet)
+class SymbolPipeline:
+    def __init__(self, symbol, csv_filename, worksheet_name=None, assembler=None):
+        self.symbol = symbol
+        if assembler is not None:
+            self.chunk_size = assembler.chunk_size
+            self.assembler = assembler
+            self.chunk_limit = assembler.total_chunks
+        else:
+            # A recording or frames file is reprocessed whole: every chunk is verified and the reader
+            # waits for the dispatchers instead of dropping chunks
+            finite_source = DATA_SOURCE in FINITE_SOURCES
+            overflow_policy = "block" if finite_source else OVERFLOW_POLICY
+            self.chunk_limit = math.inf if finite_source else NUMBER_OF_CHUNKS
+            if CHUNKING == "content_defined" and CHUNK_FORMAT == "prices":
+                self.chunk_size = CDC_MAX_CHUNK
+                chunker = GearChunker(CDC_MIN_CHUNK, CDC_AVERAGE_CHUNK, CDC_MAX_CHUNK)
+                self.assembler = ChunkAssembler(self.chunk_size, BUFFER_CAPACITY_CHUNKS, chunk_ready, overflow_policy, chunker)
+            else:
+                self.chunk_size = TRADES_PER_CHUNK * TRADE_RECORD_SIZE if CHUNK_FORMAT == "trades" else CHUNK_SIZE
+                self.assembler = ChunkAssembler(self.chunk_size, BUFFER_CAPACITY_CHUNKS, chunk_ready, overflow_policy)
+        self.trade_batch = TradeBatch()  # Trades decoded since the last full batch
+        self.chunks_claimed = 0  # Chunk counter; the next chunk dispatched is number chunks_claimed + 1
+        self.busy = False  # Chunks of one symbol are verified one at a time, in order
+        self.csv_filename = csv_filename
+        self.worksheet_name = worksheet_name
+        self.worksheet = None  # Added to the workbook by open_outputs
+        self.start_row = 1  # Start row for the first chunk
+        self.segment_count = max_segment_count(self.chunk_size)
+        # A wider plan would lose its last vote columns and the summary columns from the matrix table
+        if len(matrix_headers(self.segment_count)) > MATRIX_TABLE_MAX_COLUMNS:
+            raise ValueError(f'"{SEGMENTATION_STRATEGY}" segmentation cuts {self.chunk_size}-byte chunks into up to {self.segment_count} segments, '
+                             f'more than the matrix table has columns for ({MATRIX_TABLE_MAX_COLUMNS - len(matrix_headers(2)) + 2}); '
+                             f'use longer segments or smaller chunks')
+
+    # Creates this pipeline's worksheet and truncates its CSV file
+    def open_outputs(self, workbook):
+        self.worksheet = workbook.add_worksheet(self.worksheet_name)
+
+        # Write headers to the worksheet, across the first row
+        for col_num, header in enumerate(matrix_headers(self.segment_count)):
+            self.worksheet.write(0, col_num, header)
+
+        # File Initializations
+        with open(self.csv_filename, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(["CHUNK #", "TIMESTAMP", "DATA", "SIZE", "SIGNATURE", "OUTCOME", "PERCENTAGE"])
+
+    # Adds one decoded trade; each full batch is packed and handed to the assembler as exactly one chunk
+    def add_trade(self, trade_id, event_time, price, quantity):
+        self.trade_batch.append(trade_id, event_time, price, quantity)
+        if len(self.trade_batch) == TRADES_PER_CHUNK:
+            self.assembler.append(self.trade_batch.pack())
+            self.trade_batch.clear()
+
+    # Text stored in the CSV DATA column; mapped file chunks are recorded by byte range instead of content
+    def chunk_text(self, slot, chunk_data):
+        if isinstance(self.assembler, MappedFileChunks):
+            return f"{self.assembler.filename}[{slot}:{slot + len(chunk_data)}]"
+        return format_chunk_data(chunk_data)
+
+    def chunk_label(self, chunk_number):
+        return f"{self.symbol.upper()} Chunk {chunk_number}" if MULTI_SYMBOL_MODE else f"Chunk {chunk_number}"
+
+# Function to build the symbol pipelines; single-symbol mode keeps the original output file names
+def create_pipelines():
+    if DATA_SOURCE == "mmap":
+        return {MAPPED_FILE: SymbolPipeline(Path(MAPPED_FILE).name, 'chunk_data_records.csv', assembler=MappedFileChunks(MAPPED_FILE, FILE_CHUNK_SIZE))}
+    if MULTI_SYMBOL_MODE:
+        return {symbol: SymbolPipeline(symbol, f'chunk_data_records_{symbol}.csv', symbol.upper()) for symbol in SYMBOLS}
+    return {SYMBOLS[0]: SymbolPipeline(SYMBOLS[0], 'chunk_data_records.csv')}
+
+pipelines = {}  # Built by main() for the configured data source
+
+# Function to create the output files when the first chunk result is ready, so a run that never verifies
+# a chunk leaves earlier results untouched; called with workbook_lock held
+def open_output_sinks():
+    global workbook
+    if workbook is None:
+        import xlsxwriter  # Deferred: only needed once there is a result to write
+        workbook = xlsxwriter.Workbook('matrix_tables.xlsx')
+        for pipeline in pipelines.values():
+            pipeline.open_outputs(workbook)
+
+# Function to print the share of True votes cast by honest and by faulty nodes over the run
+def report_node_stats(registry):
+    for label, rows in (("Honest", ~registry.is_faulty), ("Faulty", registry.is_faulty)):
+        votes_cast = int(registry.votes_cast[rows].sum())
+        if votes_cast:
+            print(f"{label} nodes: {int(rows.sum())}, {int(registry.true_votes[rows].sum()) / votes_cast * 100:.2f}% of {votes_cast} votes True")
+
+# Function to print node response times from the histograms: the distribution over all nodes, percentiles
+# (as bucket upper bounds) and the slowest nodes by their own p99
+def report_response_times(registry):
+    histogram = registry.response_histogram.sum(axis=0)
+    responses = int(histogram.sum())
+    if not responses:
+        return
+    bounds = [f"<={bound * 1000:g}ms" for bound in RESPONSE_TIME_BUCKETS] + [f">{RESPONSE_TIME_BUCKETS[-1] * 1000:g}ms"]
+
+    def percentile(counts, fraction):
+        index = int(np.searchsorted(np.cumsum(counts), fraction * counts.sum()))
+        return bounds[min(index, len(bounds) - 1)]
+
+    print(f"Node response times ({responses} responses): " + ", ".join(f"{bound} {count}" for bound, count in zip(bounds, histogram.tolist()) if count))
+    print(f"  p50 {percentile(histogram, 0.5)}, p95 {percentile(histogram, 0.95)}, p99 {percentile(histogram, 0.99)}, "
+          f"{int(registry.abstentions.sum())} abstentions")
+    node_p99 = [int(np.searchsorted(np.cumsum(counts), 0.99 * counts.sum())) if counts.sum() else -1 for counts in registry.response_histogram]
+    slowest = sorted(range(len(node_p99)), key=lambda node_id: node_p99[node_id], reverse=True)[:3]
+    print("  Slowest nodes: " + ", ".join(f"node {node_id} p99 {bounds[min(node_p99[node_id], len(bounds) - 1)]}" for node_id in slowest if node_p99[node_id] >= 0))
+
+# Function to summarize the PBFT commits of a run
+def report_pbft_stats(cluster):
+    latencies = np.array(cluster.commit_latencies) * 1000
+    print(f"PBFT: {cluster.replica_count} replicas (f = {cluster.f}), {len(latencies)} chunks committed, view {cluster.view}, "
+          f"{cluster.messages_sent} replica messages")
+    if len(latencies):
+        print(f"  Commit latency: mean {latencies.mean():.2f} ms, p50 {np.percentile(latencies, 50):.2f} ms, "
+              f"p99 {np.percentile(latencies, 99):.2f} ms")
+
+# Function to print how long after start-up the first chunk was ready and verified; called with workbook_lock held
+first_chunk_reported = False
+def report_first_chunk(completed_at):
+    global first_chunk_reported
+    if not first_chunk_reported:
+        first_chunk_reported = True
+        print(f"Time to first chunk: data ready {(completed_at - process_started) * 1000:.1f} ms, "
+              f"verified {(time.perf_counter() - process_started) * 1000:.1f} ms after start-up "
+              f"(crypto ready at {(crypto_ready_at - process_started) * 1000:.1f} ms)")
+
+# Function for an honest node's vote on one segment: the hash matches, the signature (over the segment hash,
+# or over the Merkle root its inclusion proof leads to) is valid and the timestamp is fresh.
+# signature_valid carries the node's signature check when it already ran on the crypto executor.
+def honest_vote(segment, segment_hash, public_key, signature, timestamp, merkle_proof=None, key_id=None, signature_valid=None):
+    calculated_hash = hashlib.sha256(segment).digest()
+    if calculated_hash != segment_hash:
+        return False
+
+    # In Merkle-root mode the signature covers the root the segment's inclusion proof leads to
+    signed_digest = calculated_hash if merkle_proof is None else merkle_root_from_proof(calculated_hash, merkle_proof)
+    if signature_valid is None:
+        signature_valid = check_signature(public_key, key_id, signature, signed_digest)
+    if not signature_valid:
+        return False
+
+    if datetime.now().timestamp() - timestamp > 300:
+        return False
+
+    return True
+
+# Function to run a signature check, or in "shared" verification mode reuse the result of the first honest
+# node that checked the same digest and signature under the same key
+def check_signature(public_key, key_id, signature, signed_digest):
+    if VERIFICATION_MODE == "shared":
+        cache_key = (signed_digest, signature, key_id or public_key_id(public_key))
+        valid = verification_cache.get(cache_key)
+        if valid is not None:
+            return valid
+    try:
+        signature_scheme.verify(public_key, signature, signed_digest)
+        valid = True
+    except Exception:
+        valid = False
+    if VERIFICATION_MODE == "shared":
+        verification_cache.put(cache_key, valid)
+    return valid
+
+# How faulty nodes vote: "random" flips a coin per segment, "reject" always votes False, "approve" always True
+FAULT_MODELS = ("random", "reject", "approve")
+RESPONSE_TIME_BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1, 2, 5)  # Upper bounds in seconds
+
+# Node Registry Class
+# Struct-of-arrays store for every simulated node: ids, fault flags, fault model codes (0 = honest,
+# otherwise 1 + index into FAULT_MODELS) and per-node vote counters are NumPy arrays rather than one
+# Python object per node, so a DHT can hold 10k-100k nodes. node() hands out a __slots__ Node view
+# where per-node code needs an object. bulk_vote evaluates a whole chunk at once: honest nodes all see
+# the same segments, so each segment is checked once and the verdict broadcast to every honest row,
+# while faulty rows are drawn with one array operation per fault model. block_votes does the same for a
+# block of nodes, so early termination can stop between blocks.
+class NodeRegistry:
+    def __init__(self, node_count, faulty_count, fault_model):
+        self.node_ids = np.arange(node_count)
+        self.is_faulty = self.node_ids < faulty_count
+        self.fault_model = np.where(self.is_faulty, FAULT_MODELS.index(fault_model) + 1, 0).astype(np.uint8)
+        self.latency_scale = np.where(self.node_ids >= node_count - math.floor(node_count * SLOW_NODE_PROPORTION), SLOW_NODE_FACTOR, 1)
+        self.votes_cast = np.zeros(node_count, dtype=np.int64)
+        self.true_votes = np.zeros(node_count, dtype=np.int64)
+        self.abstentions = np.zeros(node_count, dtype=np.int64)
+        self.response_histogram = np.zeros((node_count, len(RESPONSE_TIME_BUCKETS) + 1), dtype=np.int64)  # Last column: slower than every bucket
+        self._stats_lock = threading.Lock()  # Dispatchers and vote workers record concurrently
+
+    def __len__(self):
+        return len(self.node_ids)
+
+    def node(self, node_id):
+        return Node(self, node_id)
+
+    # Returns the nodes x segments bool matrix of every node's vote on a chunk
+    def bulk_vote(self, segments_info, public_key, key_id):
+        rng = np.random.default_rng()  # Per call: dispatcher threads must not share a generator
+        return self.block_votes(self.honest_votes(segments_info, public_key, key_id), 0, len(self), len(segments_info), rng)
+
+    # Returns the vote every honest node casts on each segment of a chunk
+    def honest_votes(self, segments_info, public_key, key_id):
+        return np.array([honest_vote(segment, segment_hash, public_key, signature, timestamp, merkle_proof, key_id)
+                         for segment, segment_hash, signature, timestamp, merkle_proof in segments_info], dtype=bool)
+
+    # Returns the votes of nodes start to stop - 1 as a bool matrix; honest may be None if they are all faulty
+    def block_votes(self, honest, start, stop, segment_count, rng):
+        fault_model = self.fault_model[start:stop]
+        votes = np.zeros((stop - start, segment_count), dtype=bool)
+        if honest is not None:
+            votes[:] = honest
+        for code, model in enumerate(FAULT_MODELS, start=1):
+            rows = fault_model == code
+            faulty_count = int(rows.sum())
+            if faulty_count == 0:
+                continue
+            if model == "random":
+                votes[rows] = rng.random((faulty_count, segment_count)) < 0.5
+            else:
+                votes[rows] = model == "approve"
+        return votes
+
+    # Adds a tallied chunk's votes to the per-node counters
+    def record_votes(self, vote_matrix):
+        with self._stats_lock:
+            self.votes_cast += vote_matrix.node_cast_votes
+            self.true_votes += vote_matrix.node_true_votes
+            self.abstentions += vote_matrix.abstained
+
+    # Adds one node's response time on a chunk to its histogram
+    def record_response(self, node_id, seconds):
+        with self._stats_lock:
+            self.response_histogram[node_id, bisect.bisect_left(RESPONSE_TIME_BUCKETS, seconds)] += 1
+
+# Node Class
+# A lightweight view of one node in a NodeRegistry
+class Node:
+    __slots__ = ('registry', 'node_id')
+
+    def __init__(self, registry, node_id):
+        self.registry = registry
+        self.node_id = node_id
+
+    @property
+    def is_faulty(self):
+        return bool(self.registry.is_faulty[self.node_id])
+
+    # signature_valid carries this node's signature check when it already ran on the crypto executor
+    def vote(self, segment, segment_hash, public_key, signature, timestamp, merkle_proof=None, key_id=None, signature_valid=None):
+        fault_model = self.registry.fault_model[self.node_id]
+        if fault_model:
+            model = FAULT_MODELS[fault_model - 1]
+            return random.choice([True, False]) if model == "random" else model == "approve"
+        return honest_vote(segment, segment_hash, public_key, signature, timestamp, merkle_proof, key_id, signature_valid)
+
 # DHT Class
 class DHT:
     def __init__(self, public_key):
-        self.nodes = [Node(i, i < NUMBER_OF_FAULTY_NODES) for i in range(NUMBER_OF_NODES)]
+        self.registry = NodeRegistry(NUMBER_OF_NODES, NUMBER_OF_FAULTY_NODES, FAULT_MODEL)
         self.public_key = public_key
+        self.key_id = public_key_id(public_key)
 
-    def process_segment(self, segment, segment_hash, signature, timestamp):
-        return {node.node_id: node.vote(segment, segment_hash, self.public_key, signature, timestamp) for node in self.nodes}
+    # Node views, built on first use; bulk voting never needs them
+    @functools.cached_property
+    def nodes(self):
+        return [self.registry.node(node_id) for node_id in range(len(self.registry))]
 
-# Function to segment the data
-def segment_data(data, private_key):
+    def process_segment(self, segment, segment_hash, signature, timestamp, merkle_proof=None):
+        return {node.node_id: node.vote(segment, segment_hash, self.public_key, signature, timestamp, merkle_proof, self.key_id) for node in self.nodes}
+
+# Merkle Tree Functions
+# Leaves are the segment hashes. Leaf and inner node hashes are domain-separated so a leaf can never pass
+# for an inner node, and an odd node out is carried up unchanged rather than paired with itself.
+# A proof is the list of (sibling_hash, sibling_is_left) pairs from the leaf up to the root.
+
+# Function to hash a Merkle leaf from a segment hash
+def merkle_leaf(segment_hash):
+    return hashlib.sha256(b'\x00' + segment_hash).digest()
+
+# Function to hash two Merkle children into their parent
+def merkle_parent(left, right):
+    return hashlib.sha256(b'\x01' + left + right).digest()
+
+# Function to build a Merkle tree over segment hashes; returns (root, proofs) with one proof per segment
+def build_merkle_tree(segment_hashes):
+    level = [merkle_leaf(segment_hash) for segment_hash in segment_hashes]
+    positions = list(range(len(level)))  # Index of each leaf's ancestor in the current level
+    proofs = [[] for _ in level]
+    while len(level) > 1:
+        for leaf, position in enumerate(positions):
+            sibling = position ^ 1
+            if sibling < len(level):
+                proofs[leaf].append((level[sibling], sibling < position))
+            positions[leaf] = position // 2
+        level = [merkle_parent(level[i], level[i + 1]) if i + 1 < len(level) else level[i] for i in range(0, len(level), 2)]
+    return level[0], proofs
+
+# Function to recompute the Merkle root from a segment hash and its inclusion proof
+def merkle_root_from_proof(segment_hash, proof):
+    node = merkle_leaf(segment_hash)
+    for sibling, sibling_is_left in proof:
+        node = merkle_parent(sibling, node) if sibling_is_left else merkle_parent(node, sibling)
+    return node
+
+# Crypto Executor Class
+# Fans signing and signature checks out to a pool in batches of up to CRYPTO_BATCH_SIZE digests. Process
+# workers are forked with the signer's keys passed in DER form, so every worker signs and verifies
+# under the same key pair as the main process; thread workers share the keys directly.
+class CryptoExecutor:
+    def __init__(self, kind, workers, batch_size):
+        self.kind = kind
+        self.workers = workers
+        self.batch_size = batch_size
+        if kind == "process":
+            private_der = private_key.private_bytes(serialization.Encoding.DER, serialization.PrivateFormat.PKCS8, serialization.NoEncryption())
+            public_der = public_key.public_bytes(serialization.Encoding.DER, serialization.PublicFormat.SubjectPublicKeyInfo)
+            # Fork where available: a spawned worker would re-run this script's start-up code
+            context = multiprocessing.get_context("fork") if "fork" in multiprocessing.get_all_start_methods() else None
+            self._pool = ProcessPoolExecutor(workers, mp_context=context, initializer=init_crypto_worker,
+                                             initargs=(signature_scheme, private_der, public_der))
+            # Start every worker now, before any other thread exists to be forked mid-operation
+            for future in [self._pool.submit(time.sleep, 0) for _ in range(workers)]:
+                future.result()
+        else:
+            self._pool = ThreadPoolExecutor(workers)
+
+    # Splits one chunk's work into even batches of up to batch_size, spread over the workers: 49 pooled checks
+    # on 8 workers become 7 batches of 7, not one batch of 49 on a single worker. Batches never drop below
+    # CRYPTO_MIN_BATCH_SIZE just to reach more workers, so 7 digests to sign become batches of 4 and 3.
+    def _batches(self, items):
+        size = max(min(self.batch_size, -(-len(items) // self.workers)), min(CRYPTO_MIN_BATCH_SIZE, self.batch_size), 1)
+        size = -(-len(items) // -(-len(items) // size)) if items else size  # Same batch count, evened out
+        return [items[i:i + size] for i in range(0, len(items), size)]
+
+    # Returns one signature per digest, in order
+    def sign_many(self, digests):
+        return [signature for batch in self._pool.map(sign_batch, self._batches(digests)) for signature in batch]
+
+    # Queues one batch of (signature, digest) checks; the future's result is the list of check results
+    def submit_verify(self, checks):
+        return self._pool.submit(verify_batch, checks)
+
+    def shutdown(self):
+        self._pool.shutdown()
+
+crypto_executor = None  # Created by main when CRYPTO_EXECUTOR is set
+
+# Function to load the signer's keys into a crypto executor process
+def init_crypto_worker(scheme, private_der, public_der):
+    global signature_scheme, private_key, public_key
+    signature_scheme = scheme
+    private_key = serialization.load_der_private_key(private_der, password=None)
+    public_key = serialization.load_der_public_key(public_der)
+
+# Function to sign a batch of digests inside a crypto executor worker
+def sign_batch(digests):
+    return [signature_scheme.sign(private_key, digest) for digest in digests]
+
+# Function to check a batch of (signature, digest) pairs inside a crypto executor worker
+def verify_batch(checks):
+    results = []
+    for signature, digest in checks:
+        try:
+            signature_scheme.verify(public_key, signature, digest)
+            results.append(True)
+        except Exception:
+            results.append(False)
+    return results
+
+# Signature Checks Class
+# One chunk's (signature, digest) checks for every honest node, pooled into one list and queued on the
+# crypto executor as one set of batch futures, so batches fill up even when each node has only a few
+# segments. In "independent" mode the list holds every node's checks, in "shared" mode each distinct
+# pair once. result(node_id, segment_index) waits only for the batch holding that check, so votes are
+# counted while later batches are still running, and cancel() drops the batches not started yet once
+# the outcome is fixed. In shared mode the first read of a pair gets the pool's result and caches it,
+# counted as a cache miss just like an inline check; later reads return None, so the node's own
+# check_signature finds the result in the verification cache.
+class SignatureChecks:
+    def __init__(self, checks, node_ids, shared, key_id):
+        self._checks = checks
+        self._shared = shared
+        self._key_id = key_id
+        self._rows = {node_id: row for row, node_id in enumerate(node_ids)}
+        pooled = list(dict.fromkeys(checks)) if shared else checks * len(node_ids)
+        self._pooled_index = {check: index for index, check in enumerate(pooled)}  # Used in shared mode
+        self._futures = []
+        self._located = []  # Pooled index -> (future, position in its batch)
+        for batch in crypto_executor._batches(pooled):
+            future = crypto_executor.submit_verify(batch)
+            self._futures.append(future)
+            self._located.extend((future, position) for position in range(len(batch)))
+        self._read = set()  # Shared mode: pairs whose result has been handed out
+        self._lock = threading.Lock()
+
+    def result(self, node_id, segment_index):
+        check = self._checks[segment_index]
+        if self._shared:
+            future, position = self._located[self._pooled_index[check]]
+        else:
+            future, position = self._located[self._rows[node_id] * len(self._checks) + segment_index]
+        valid = future.result()[position]
+        if not self._shared:
+            return valid
+        signature, digest = check
+        cache_key = (digest, signature, self._key_id)
+        with self._lock:
+            if check in self._read:
+                return None
+            self._read.add(check)
+            verification_cache.get(cache_key)  # A miss, unless an earlier chunk already checked this pair
+            verification_cache.put(cache_key, valid)
+        return valid
 
-    # Define head and tail segments
-    head = data[:50]  # First 50 characters for head segment
-    tail = data[-50:]  # Last 50 characters for tail segment
+    # A node's checks as a callable segment_index -> result, or None for a node without checks (a faulty one)
+    def for_node(self, node_id):
+        return functools.partial(self.result, node_id) if node_id in self._rows else None
 
-    # Calculate the length of the entire middle section
-    middle_section_length = CHUNK_SIZE - (len(head) + len(tail))
-    segment_length = middle_section_length // NUMBER_OF_SEGMENTS
+    def cancel(self):
+        for future in self._futures:
+            future.cancel()
 
-    # Define middle segments
-    middle_start = len(head)
-    segments = [head]
-    for _ in range(NUMBER_OF_SEGMENTS):
-        segments.append(data[middle_start:middle_start + segment_length])
-        middle_start += segment_length
+# Function to queue the honest nodes' signature checks for a chunk on the crypto executor as one
+# SignatureChecks. In "independent" mode every honest node's checks are run; in "shared" mode each
+# distinct (digest, signature) is checked once for all of them.
+def run_signature_checks(dht, segments_info):
+    checks = []
+    for segment, _, signature, _, merkle_proof in segments_info:
+        calculated_hash = hashlib.sha256(segment).digest()
+        checks.append((signature, calculated_hash if merkle_proof is None else merkle_root_from_proof(calculated_hash, merkle_proof)))
+    honest = [node.node_id for node in dht.nodes if not node.is_faulty]
+    return SignatureChecks(checks, honest, VERIFICATION_MODE == "shared", dht.key_id)
 
-    # Add the tail segment
-    segments.append(tail)
+# Function to sign digests in order, reusing earlier signatures of the same digest when enabled and
+# signing the rest on the crypto executor when there is one
+def sign_digests(digests, private_key):
+    signatures = [signature_cache.get(digest) if REUSE_SIGNATURES else None for digest in digests]
+    unsigned = [index for index, signature in enumerate(signatures) if signature is None]
+    if crypto_executor is not None and len(unsigned) > 1:
+        fresh = crypto_executor.sign_many([digests[index] for index in unsigned])
+    else:
+        fresh = [signature_scheme.sign(private_key, digests[index]) for index in unsigned]
+    for index, signature in zip(unsigned, fresh):
+        signatures[index] = signature
+        if REUSE_SIGNATURES:
+            signature_cache.put(digests[index], signature)
+    return signatures
+
+# Function to segment the data
+# Segments are memoryview slices of the chunk and digests stay binary; hex encoding happens only when
+# results are written out. Each entry is (segment, hash, signature, timestamp, merkle_proof); in
+# "merkle_root" mode every segment shares the one root signature and carries its inclusion proof,
+# otherwise the proof is None and each segment is signed on its own.
+def segment_data(data, private_key):
+    data = memoryview(data)
+    segments = [data[start:end] for start, end in chunk_segment_plan(data)]
+    segment_hashes = [hashlib.sha256(segment).digest() for segment in segments]
+
+    if SIGNING_MODE == "merkle_root":
+        root, proofs = build_merkle_tree(segment_hashes)
+        root_signature = sign_digests([root], private_key)[0]
+        timestamp = datetime.now().timestamp()
+        return [(segment, segment_hash, root_signature, timestamp, proof) for segment, segment_hash, proof in zip(segments, segment_hashes, proofs)]
 
-    # Generate hash, signature, and timestamp for each segment
+    # Generate signature and timestamp for each segment
     segment_info = []
-    for segment in segments:
-        segment_hash = hashlib.sha256(segment.encode()).hexdigest()
-        signature = private_key.sign(
-            segment_hash.encode(),
-            padding.PSS(
-                mgf=padding.MGF1(hashes.SHA256()),
-                salt_length=padding.PSS.MAX_LENGTH
-            ),
-            hashes.SHA256()
-        )
+    for segment, segment_hash, signature in zip(segments, segment_hashes, sign_digests(segment_hashes, private_key)):
         timestamp = datetime.now().timestamp()
-        segment_info.append((segment, segment_hash, signature, timestamp))
+        segment_info.append((segment, segment_hash, signature, timestamp, None))
 
     return segment_info
 
+# Function to list the distinct signatures of a chunk for the output files: the root signature once in "merkle_root" mode
+def chunk_signatures(segments_info):
+    if SIGNING_MODE == "merkle_root":
+        return [segments_info[0][2]]
+    return [info[2] for info in segments_info]
+
+# Vote Matrix Class
+# One chunk's votes as a nodes x segments NumPy bool array, with a matching mask of the votes actually
+# cast (early termination leaves the rest skipped) and a mask of nodes that abstained. Abstentions
+# count toward the total but never as True. tally() derives everything the outcome and the
+# writers need in a few array operations: per-node true votes, percentages and GOOD/FAULTY status,
+# per-segment approvals and quorums, and the chunk outcome against min_approvals.
+class VoteMatrix:
+    def __init__(self, node_count, segment_count):
+        self.votes = np.zeros((node_count, segment_count), dtype=bool)
+        self.cast = np.zeros((node_count, segment_count), dtype=bool)
+        self.abstained = np.zeros(node_count, dtype=bool)  # Nodes that missed the vote deadline
+        self.decided_after = self.votes.size  # Votes counted when the outcome became fixed
+
+    # Records a node's votes on its first len(votes) segments
+    def set_votes(self, node_id, votes):
+        self.votes[node_id, :len(votes)] = votes
+        self.cast[node_id, :len(votes)] = True
+
+    def tally(self):
+        node_count, segment_count = self.votes.shape
+        self.node_cast_votes = self.cast.sum(axis=1)
+        self.node_true_votes = self.votes.sum(axis=1)
+        self.node_percentages = self.node_true_votes * 100 / np.maximum(self.node_cast_votes, 1)  # Including head and tail
+        self.node_good = self.node_true_votes >= np.ceil(self.node_cast_votes * 0.85)  # Majority of a node's own votes
+        self.segment_approvals = self.votes.sum(axis=0)
+        self.segment_quorum = self.segment_approvals >= min_approvals(node_count)
+        self.total_votes = self.votes.size
+        self.cast_votes = int(self.node_cast_votes.sum())
+        self.abstained_votes = int(self.abstained.sum()) * segment_count
+        self.skipped_votes = self.total_votes - self.cast_votes - self.abstained_votes
+        self.total_true_votes = int(self.node_true_votes.sum())
+        self.true_vote_percentage = (self.total_true_votes / max(self.cast_votes, 1)) * 100  # Of the votes cast
+        self.passed = self.total_true_votes >= min_approvals(self.total_votes)
+        return self
+
+# Function to collect the nodes' votes on every segment into the vote matrix, node by node.
+# With EARLY_TERMINATION a running tally stops as soon as enough True votes are in to pass, or enough
+# False votes that passing is impossible, and cancels verification batches that have not started; with
+# AUDIT_VOTES as well, every vote is still collected and only the point of decision is recorded.
+def collect_votes(dht, segments_info, vote_matrix):
+    if VOTING_ENGINE == "bulk":
+        collect_votes_bulk(dht, segments_info, vote_matrix)
+        return
+
+    if VOTING_ENGINE == "parallel":
+        collect_votes_parallel(dht, segments_info, vote_matrix)
+        return
+
+    total_votes = vote_matrix.votes.size
+    needed = min_approvals(total_votes)
+    signature_checks = run_signature_checks(dht, segments_info) if crypto_executor is not None else None
+    true_votes = false_votes = 0
+    decided = not EARLY_TERMINATION
+    for node in dht.nodes:
+        node_checks = signature_checks.for_node(node.node_id) if signature_checks is not None else None
+        votes = []
+        for segment_index, (segment, segment_hash, signature, timestamp, merkle_proof) in enumerate(segments_info):
+            vote = node.vote(segment, segment_hash, dht.public_key, signature, timestamp, merkle_proof, dht.key_id,
+                             node_checks(segment_index) if node_checks is not None else None)
+            votes.append(vote)
+            if decided:
+                continue
+            true_votes += vote
+            false_votes += not vote
+            if true_votes >= needed or false_votes > total_votes - needed:
+                decided = True
+                vote_matrix.decided_after = true_votes + false_votes
+                if not AUDIT_VOTES:
+                    vote_matrix.set_votes(node.node_id, votes)
+                    if signature_checks is not None:
+                        signature_checks.cancel()
+                    return
+        vote_matrix.set_votes(node.node_id, votes)
+
+# Function to collect the votes with the "bulk" engine. Without early termination (or when auditing it)
+# the whole registry votes in one pass and running sums locate the point of decision. Otherwise nodes
+# vote BULK_VOTE_BLOCK at a time and voting stops after the block in which the outcome became fixed;
+# that block's later votes were computed, so they are kept as cast and only later blocks are skipped.
+def collect_votes_bulk(dht, segments_info, vote_matrix):
+    registry = dht.registry
+    node_count, segment_count = vote_matrix.votes.shape
+    total_votes = vote_matrix.votes.size
+    needed = min_approvals(total_votes)
+    if not EARLY_TERMINATION or AUDIT_VOTES:
+        vote_matrix.votes[:] = registry.bulk_vote(segments_info, dht.public_key, dht.key_id)
+        vote_matrix.cast[:] = True
+        if EARLY_TERMINATION:
+            true_running = np.cumsum(vote_matrix.votes.reshape(-1))
+            false_running = np.arange(1, total_votes + 1) - true_running
+            vote_matrix.decided_after = int(np.flatnonzero((true_running >= needed) | (false_running > total_votes - needed))[0]) + 1
+        return
+
+    rng = np.random.default_rng()  # Per call: dispatcher threads must not share a generator
+    honest = None
+    true_votes = counted = 0
+    for start in range(0, node_count, BULK_VOTE_BLOCK):
+        stop = min(start + BULK_VOTE_BLOCK, node_count)
+        if honest is None and not registry.is_faulty[start:stop].all():
+            honest = registry.honest_votes(segments_info, dht.public_key, dht.key_id)
+        block = registry.block_votes(honest, start, stop, segment_count, rng)
+        vote_matrix.votes[start:stop] = block
+        vote_matrix.cast[start:stop] = True
+        true_running = true_votes + np.cumsum(block.reshape(-1))
+        false_running = counted + np.arange(1, block.size + 1) - true_running
+        decided = np.flatnonzero((true_running >= needed) | (false_running > total_votes - needed))
+        if decided.size:
+            vote_matrix.decided_after = counted + int(decided[0]) + 1
+            return
+        true_votes, counted = int(true_running[-1]), counted + block.size
+
+node_vote_pool = None  # Created by main for the "parallel" voting engine: computes votes once a node's delay has passed
+node_vote_loop = None  # Event loop thread created by main that waits out every node's simulated delay concurrently
+
+# Function for one node's votes on every segment of a chunk
+def node_votes(dht, node, segments_info, node_checks):
+    return [node.vote(segment, segment_hash, dht.public_key, signature, timestamp, merkle_proof, dht.key_id,
+                      node_checks(segment_index) if node_checks is not None else None)
+            for segment_index, (segment, segment_hash, signature, timestamp, merkle_proof) in enumerate(segments_info)]
+
+# One node's response on the node vote loop: its simulated delay is a timer on the loop, so every node waits
+# at once, and only the vote itself takes a pool thread. Returns (votes, seconds from the task's start).
+async def node_vote_task(dht, node, segments_info, node_checks, delay):
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    await asyncio.sleep(delay)
+    votes = await loop.run_in_executor(node_vote_pool, node_votes, dht, node, segments_info, node_checks)
+    return votes, loop.time() - started
+
+# Function to run the event loop that simulated node delays wait on; returns the loop
+def start_node_vote_loop():
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="node-vote-loop", daemon=True).start()
+    return loop
+
+# Function to collect votes with every node voting concurrently. Nodes still voting when VOTE_DEADLINE
+# passes abstain and are recorded at their sampled delay (or the time waited, if longer), so the
+# histograms keep the tail instead of hiding it. Early termination works per node as votes arrive;
+# nodes cancelled that way never responded and are not recorded.
+def collect_votes_parallel(dht, segments_info, vote_matrix):
+    total_votes = vote_matrix.votes.size
+    needed = min_approvals(total_votes)
+    signature_checks = run_signature_checks(dht, segments_info) if crypto_executor is not None else None
+    started = time.perf_counter()
+    deadline = started + VOTE_DEADLINE
+
+    delays = {}
+    pending = {}
+    for node in dht.nodes:
+        delays[node.node_id] = random.expovariate(1 / (NODE_LATENCY_MEAN * dht.registry.latency_scale[node.node_id])) if NODE_LATENCY_MEAN else 0
+        future = asyncio.run_coroutine_threadsafe(
+            node_vote_task(dht, node, segments_info, signature_checks.for_node(node.node_id) if signature_checks is not None else None,
+                           delays[node.node_id]), node_vote_loop)
+        pending[future] = node.node_id
+
+    true_votes = false_votes = 0
+    decided = not EARLY_TERMINATION
+    while pending:
+        done, _ = wait(pending, timeout=max(deadline - time.perf_counter(), 0), return_when=FIRST_COMPLETED)
+        if not done:
+            break  # Deadline passed
+        for future in done:
+            node_id = pending.pop(future)
+            votes, response_seconds = future.result()
+            dht.registry.record_response(node_id, response_seconds)
+            vote_matrix.set_votes(node_id, votes)
+            if decided:
+                continue
+            true_votes += sum(votes)
+            false_votes += len(votes) - sum(votes)
+            if true_votes >= needed or false_votes > total_votes - needed:
+                decided = True
+                vote_matrix.decided_after = true_votes + false_votes
+        if decided and EARLY_TERMINATION and not AUDIT_VOTES:
+            for future in pending:
+                future.cancel()
+            if signature_checks is not None:
+                signature_checks.cancel()
+            return
+
+    # Nodes that missed the deadline abstain
+    waited = time.perf_counter() - started
+    for future, node_id in pending.items():
+        future.cancel()
+        vote_matrix.abstained[node_id] = True
+        dht.registry.record_response(node_id, max(delays[node_id], waited))
+
+# Function to encode a PBFT message body the same way for signing and for checking
+def pbft_payload(body):
+    return json.dumps(body, sort_keys=True, separators=(",", ":")).encode()
+
+# Function to wrap a PBFT message body with its sender's Ed25519 signature
+def pbft_envelope(signing_key, body):
+    return {"body": body, "signature": signing_key.sign(pbft_payload(body)).hex()}
+
+# Function for the digest a PRE-PREPARE binds to its sequence number: the whole signed request
+def pbft_request_digest(request):
+    return hashlib.sha256(pbft_payload(request)).hexdigest()
+
+PBFT_NULL_DIGEST = hashlib.sha256(b"null request").hexdigest()  # Fills sequence gaps left by a round change
+PBFT_GENESIS_STATE = hashlib.sha256(b"genesis").hexdigest()  # State before any request, the implicit checkpoint 0
+PBFT_LINE_LIMIT = 2 ** 24  # Largest message line; NEW-VIEW carries every VIEW-CHANGE it was built from, with their proofs
+
+# PBFT Replica Class
+# One replica of a Practical Byzantine Fault Tolerance cluster (Castro and Liskov), running on the
+# cluster's event loop and exchanging signed JSON lines with the other replicas over localhost TCP.
+# Requests are ordered in three phases: the primary of the current view assigns a sequence number
+# (PRE-PREPARE), replicas agree on the assignment (PREPARE, 2f matching) and then on it being prepared
+# everywhere that matters (COMMIT, 2f + 1 matching), and execute in sequence order before replying.
+# A replica whose oldest pending request does not execute within the view timeout starts a round change
+# (VIEW-CHANGE, then NEW-VIEW from the next primary), carrying its prepared requests into the new view.
+# Every PBFT_CHECKPOINT_INTERVAL requests the replicas agree on a checkpoint and discard older log entries.
+# A VIEW-CHANGE proves what it claims: its checkpoint with 2f + 1 signed CHECKPOINTs and each prepared
+# request with the signed PRE-PREPARE and 2f signed PREPAREs, and claims without proof are ignored.
+class PBFTReplica:
+    def __init__(self, cluster, replica_id, signing_key, crashed):
+        self.cluster = cluster
+        self.replica_id = replica_id
+        self.signing_key = signing_key
+        self.crashed = crashed  # Silent: accepts connections but never handles or sends a message
+        self.f = cluster.f
+        self.view = 0
+        self.in_view_change = False
+        self.next_sequence = 0
+        self.low_watermark = 0  # Sequence number of the last stable checkpoint
+        self.stable_state = self.state_digest = PBFT_GENESIS_STATE  # Hash chain over executed requests
+        self.stable_proof = []  # The 2f + 1 signed CHECKPOINTs behind low_watermark
+        self.last_executed = 0
+        self.pending = {}  # request id -> signed request, received but not executed yet
+        self.assigned = set()  # Request ids the primary has given a sequence number in this view
+        self.executed = {}  # request id -> reply body, resent if a client retransmits
+        self.pre_prepares = {}  # (view, seq) -> signed PRE-PREPARE
+        self.prepares = {}  # (view, seq, digest) -> {replica: signed PREPARE}
+        self.commits = {}  # (view, seq, digest) -> replicas
+        self.prepared = {}  # seq -> (view, digest, request, certificate): prepared certificates carried into round changes
+        self.committed = {}  # seq -> request, committed and waiting for its turn to execute
+        self.checkpoints = {}  # (seq, state digest) -> {replica: signed CHECKPOINT}
+        self.view_changes = {}  # view -> {replica: signed VIEW-CHANGE}
+        self.deferred = []  # Messages for a view this replica has not entered yet
+        self.timer = None
+        self.timeout = PBFT_VIEW_TIMEOUT  # Doubles with each round change and stays doubled, so an overloaded cluster settles instead of changing views over and over
+        self.peers = {}  # replica id -> StreamWriter
+        self.clients = set()  # StreamWriters of client connections
+        self.connections = set()  # Every accepted StreamWriter, closed on shutdown
+        self.server = None
+
+    def primary(self, view):
+        return view % self.cluster.replica_count
+
+    # Starts listening on an ephemeral port and returns it
+    async def start(self):
+        self.server = await asyncio.start_server(self.accept, PBFT_HOST, 0, limit=PBFT_LINE_LIMIT)
+        return self.server.sockets[0].getsockname()[1]
+
+    # Opens the outgoing connection to every other replica
+    async def connect(self, ports):
+        for replica_id, port in enumerate(ports):
+            if replica_id != self.replica_id:
+                _, self.peers[replica_id] = await asyncio.open_connection(PBFT_HOST, port, limit=PBFT_LINE_LIMIT)
+
+    async def accept(self, reader, writer):
+        self.connections.add(writer)
+        try:
+            async for line in reader:
+                if not self.crashed:
+                    self.receive(json.loads(line), writer)
+        except ConnectionError:
+            pass
+        finally:
+            self.clients.discard(writer)
+            self.connections.discard(writer)
+            writer.close()
+
+    async def close(self):
+        if self.timer is not None:
+            self.timer.cancel()
+        self.server.close()
+        for writer in [*self.peers.values(), *self.connections]:
+            writer.close()
+        await self.server.wait_closed()
+
+    def receive(self, envelope, writer):
+        if not self.cluster.verify(envelope):
+            return
+        if envelope["body"]["type"] == "REQUEST":
+            self.clients.add(writer)
+        self.handle(envelope)
+
+    # Sends a message to every other replica and handles it locally, as every replica counts its own vote
+    def broadcast(self, body):
+        envelope = pbft_envelope(self.signing_key, body)
+        line = json.dumps(envelope).encode() + b"\n"
+        for writer in self.peers.values():
+            writer.write(line)
+        self.cluster.messages_sent += len(self.peers)
+        self.handle(envelope)
+
+    def reply(self, body):
+        line = json.dumps(pbft_envelope(self.signing_key, body)).encode() + b"\n"
+        for writer in self.clients:
+            writer.write(line)
+
+    def handle(self, envelope):
+        body = envelope["body"]
+        kind = body["type"]
+        if kind in ("PRE-PREPARE", "PREPARE", "COMMIT"):
+            if body["view"] > self.view or (body["view"] == self.view and self.in_view_change):
+                self.deferred.append(envelope)  # Handled once this replica enters that view
+                return
+            if body["view"] < self.view:
+                return
+        handler = {"REQUEST": self.on_request, "PRE-PREPARE": self.on_pre_prepare, "PREPARE": self.on_prepare,
+                   "COMMIT": self.on_commit, "CHECKPOINT": self.on_checkpoint, "VIEW-CHANGE": self.on_view_change,
+                   "NEW-VIEW": self.on_new_view}.get(kind)
+        if handler is not None:
+            handler(envelope)
+
+    def on_request(self, envelope):
+        request_id = envelope["body"]["request"]
+        if request_id in self.executed:
+            self.reply(self.executed[request_id])
+            return
+        if request_id in self.pending:
+            return
+        self.pending[request_id] = envelope
+        if self.primary(self.view) == self.replica_id and not self.in_view_change:
+            self.assign_sequences()
+        self.start_timer()
+
+    # Primary: gives pending requests the next sequence numbers the log window allows
+    def assign_sequences(self):
+        for request_id, request in list(self.pending.items()):
+            if self.next_sequence >= self.low_watermark + PBFT_LOG_WINDOW:
+                break  # Resumes when the next checkpoint becomes stable
+            if request_id not in self.assigned:
+                self.assigned.add(request_id)
+                self.next_sequence += 1
+                self.broadcast({"type": "PRE-PREPARE", "view": self.view, "seq": self.next_sequence,
+                                "digest": pbft_request_digest(request), "request": request, "replica": self.replica_id})
+
+    # Checks that a PRE-PREPARE's digest is that of its request, signed by the client, or of the null request
+    def valid_request(self, body):
+        request = body["request"]
+        if request is None:
+            return body["digest"] == PBFT_NULL_DIGEST
+        return request["body"]["type"] == "REQUEST" and pbft_request_digest(request) == body["digest"] and self.cluster.verify(request)
+
+    def on_pre_prepare(self, envelope):
+        self.accept_pre_prepare(envelope)
+
+    def accept_pre_prepare(self, envelope):
+        body = envelope["body"]
+        view, seq, request = body["view"], body["seq"], body["request"]
+        if body["replica"] != self.primary(view) or not self.low_watermark < seq <= self.low_watermark + PBFT_LOG_WINDOW:
+            return
+        if (view, seq) in self.pre_prepares:
+            return  # Duplicate, or a conflicting assignment from a faulty primary
+        if not self.valid_request(body):
+            return
+        self.pre_prepares[(view, seq)] = envelope
+        if request is not None and request["body"]["request"] not in self.executed:
+            self.pending.setdefault(request["body"]["request"], request)
+            self.start_timer()
+        if self.primary(view) != self.replica_id:
+            self.broadcast({"type": "PREPARE", "view": view, "seq": seq, "digest": body["digest"], "replica": self.replica_id})
+        self.check_prepared(view, seq, body["digest"])
+
+    def on_prepare(self, envelope):
+        body = envelope["body"]
+        if body["replica"] == self.primary(body["view"]):
+            return  # The primary's PRE-PREPARE stands in for its PREPARE
+        self.prepares.setdefault((body["view"], body["seq"], body["digest"]), {})[body["replica"]] = envelope
+        self.check_prepared(body["view"], body["seq"], body["digest"])
+
+    # Prepared: the PRE-PREPARE plus 2f matching PREPAREs from other replicas
+    def check_prepared(self, view, seq, digest):
+        pre_prepare = self.pre_prepares.get((view, seq))
+        if pre_prepare is None or pre_prepare["body"]["digest"] != digest or self.prepared.get(seq, (None,))[0] == view:
+            return
+        prepares = self.prepares.get((view, seq, digest), {})
+        if len(prepares) < 2 * self.f:
+            return
+        certificate = {"pre_prepare": pre_prepare, "prepares": list(prepares.values())}
+        self.prepared[seq] = (view, digest, pre_prepare["body"]["request"], certificate)
+        self.broadcast({"type": "COMMIT", "view": view, "seq": seq, "digest": digest, "replica": self.replica_id})
+        self.check_committed(view, seq, digest)
+
+    def on_commit(self, envelope):
+        body = envelope["body"]
+        self.commits.setdefault((body["view"], body["seq"], body["digest"]), set()).add(body["replica"])
+        self.check_committed(body["view"], body["seq"], body["digest"])
+
+    # Committed: prepared here plus 2f + 1 matching COMMITs
+    def check_committed(self, view, seq, digest):
+        if seq <= self.last_executed or seq in self.committed or self.prepared.get(seq, (None, None))[:2] != (view, digest):
+            return
+        if len(self.commits.get((view, seq, digest), ())) < 2 * self.f + 1:
+            return
+        self.committed[seq] = self.prepared[seq][2]
+        self.execute()
+
+    # Executes committed requests in sequence order; executing a chunk request extends the state hash chain
+    def execute(self):
+        while self.last_executed + 1 in self.committed:
+            seq = self.last_executed + 1
+            request = self.committed.pop(seq)
+            self.last_executed = seq
+            digest = pbft_request_digest(request) if request is not None else PBFT_NULL_DIGEST
+            self.state_digest = hashlib.sha256((self.state_digest + digest).encode()).hexdigest()
+            if request is not None:
+                request_id = request["body"]["request"]
+                self.pending.pop(request_id, None)
+                if request_id not in self.executed:
+                    self.executed[request_id] = {"type": "REPLY", "view": self.view, "request": request_id, "seq": seq,
+                                                 "result": self.state_digest, "replica": self.replica_id}
+                    self.reply(self.executed[request_id])
+            if seq % PBFT_CHECKPOINT_INTERVAL == 0:
+                self.broadcast({"type": "CHECKPOINT", "seq": seq, "state": self.state_digest, "replica": self.replica_id})
+        self.reset_timer()
+
+    def on_checkpoint(self, envelope):
+        body = envelope["body"]
+        if body["seq"] <= self.low_watermark:
+            return
+        proof = self.checkpoints.setdefault((body["seq"], body["state"]), {})
+        proof[body["replica"]] = envelope
+        if len(proof) >= 2 * self.f + 1:
+            self.stabilize(body["seq"], body["state"], list(proof.values()))
+
+    # Makes a checkpoint stable: moves the log window up and discards everything at or below it
+    def stabilize(self, seq, state, proof):
+        self.low_watermark, self.stable_state, self.stable_proof = seq, state, proof
+        if self.last_executed < seq:
+            # Fell behind the cluster: adopt the agreed state (stands in for PBFT's state transfer)
+            self.last_executed, self.state_digest = seq, state
+        for log in (self.pre_prepares, self.prepares, self.commits):
+            for key in [key for key in log if key[1] <= seq]:
+                del log[key]
+        for log in (self.prepared, self.committed):
+            for key in [key for key in log if key <= seq]:
+                del log[key]
+        for key in [key for key in self.checkpoints if key[0] <= seq]:
+            del self.checkpoints[key]
+        for request_id in [request_id for request_id, reply in self.executed.items() if reply["seq"] <= seq - PBFT_LOG_WINDOW]:
+            del self.executed[request_id]
+        if self.primary(self.view) == self.replica_id and not self.in_view_change:
+            self.assign_sequences()
+
+    def start_timer(self):
+        if self.timer is None and self.pending:
+            self.timer = asyncio.get_running_loop().call_later(self.timeout, self.start_view_change, self.view + 1)
+
+    def reset_timer(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if not self.in_view_change:
+            self.start_timer()
+
+    # Round change: stop accepting messages for the current view and vote for the next primary
+    def start_view_change(self, new_view):
+        if new_view <= self.view:
+            return
+        if self.timer is not None:
+            self.timer.cancel()
+        self.view = new_view
+        self.in_view_change = True
+        prepared = [certificate for seq, (_, _, _, certificate) in sorted(self.prepared.items()) if seq > self.low_watermark]
+        self.broadcast({"type": "VIEW-CHANGE", "view": new_view, "checkpoint": self.low_watermark, "state": self.stable_state,
+                        "checkpoint_proof": self.stable_proof, "prepared": prepared, "replica": self.replica_id})
+        # If the new primary is faulty too, move on to the one after it, waiting longer each time
+        self.timer = asyncio.get_running_loop().call_later(self.timeout, self.start_view_change, new_view + 1)
+        self.timeout *= 2
+
+    def on_view_change(self, envelope):
+        body = envelope["body"]
+        new_view = body["view"]
+        if new_view < self.view or (new_view == self.view and not self.in_view_change):
+            return
+        votes = self.view_changes.setdefault(new_view, {})
+        votes[body["replica"]] = envelope
+        if new_view > self.view and len(votes) > self.f:
+            self.start_view_change(new_view)  # f + 1 replicas want to move on, so at least one honest replica timed out
+        if (self.primary(new_view) == self.replica_id and self.view == new_view and self.in_view_change
+                and len(votes) >= 2 * self.f + 1):
+            _, _, _, planned = self.plan_new_view(new_view, [vote["body"] for vote in votes.values()])
+            self.broadcast({"type": "NEW-VIEW", "view": new_view, "view_changes": list(votes.values()),
+                            "pre_prepares": [pbft_envelope(self.signing_key, body) for body in planned], "replica": self.replica_id})
+
+    # Checks a checkpoint claim: 2f + 1 distinct replicas signed a CHECKPOINT for exactly this seq and state
+    def valid_checkpoint(self, seq, state, proof):
+        if seq == 0:
+            return state == PBFT_GENESIS_STATE
+        signers = {envelope["body"]["replica"] for envelope in proof
+                   if envelope["body"]["type"] == "CHECKPOINT" and envelope["body"]["seq"] == seq
+                   and envelope["body"]["state"] == state and self.cluster.verify(envelope)}
+        return len(signers) >= 2 * self.f + 1
+
+    # Checks a prepared certificate from an earlier view: the PRE-PREPARE signed by that view's primary for
+    # a valid request, and matching PREPAREs signed by 2f distinct other replicas
+    def valid_certificate(self, certificate, new_view):
+        pre_prepare = certificate["pre_prepare"]["body"]
+        view, seq, digest = pre_prepare["view"], pre_prepare["seq"], pre_prepare["digest"]
+        if (pre_prepare["type"] != "PRE-PREPARE" or not 0 <= view < new_view or pre_prepare["replica"] != self.primary(view)
+                or not self.cluster.verify(certificate["pre_prepare"]) or not self.valid_request(pre_prepare)):
+            return False
+        signers = {envelope["body"]["replica"] for envelope in certificate["prepares"]
+                   if envelope["body"]["type"] == "PREPARE" and (envelope["body"]["view"], envelope["body"]["seq"], envelope["body"]["digest"]) == (view, seq, digest)
+                   and envelope["body"]["replica"] != self.primary(view) and self.cluster.verify(envelope)}
+        return len(signers) >= 2 * self.f
+
+    # Returns what one VIEW-CHANGE proves: (checkpoint, state, proof, prepared PRE-PREPARE bodies). A
+    # checkpoint without its proof counts as checkpoint 0 and unproven certificates are dropped.
+    def view_change_evidence(self, body, new_view):
+        try:
+            if self.valid_checkpoint(body["checkpoint"], body["state"], body["checkpoint_proof"]):
+                checkpoint, state, proof = body["checkpoint"], body["state"], body["checkpoint_proof"]
+            else:
+                checkpoint, state, proof = 0, PBFT_GENESIS_STATE, []
+            prepared = []
+            for certificate in body["prepared"]:
+                try:
+                    if self.valid_certificate(certificate, new_view):
+                        prepared.append(certificate["pre_prepare"]["body"])
+                except (KeyError, TypeError, AttributeError):
+                    pass  # Malformed certificate
+            return checkpoint, state, proof, prepared
+        except (KeyError, TypeError, AttributeError):
+            return 0, PBFT_GENESIS_STATE, [], []  # Malformed VIEW-CHANGE: it still counts, but proves nothing
+
+    # Re-proposes, in the new view, every request with a proven prepared certificate above the latest proven
+    # checkpoint (the highest view's certificate wins), with null requests filling any gaps. Returns
+    # (checkpoint, state, proof, PRE-PREPARE bodies).
+    def plan_new_view(self, new_view, view_changes):
+        evidence = [self.view_change_evidence(body, new_view) for body in view_changes]
+        checkpoint, state, proof, _ = max(evidence, key=lambda item: item[0])
+        certificates = {}
+        for _, _, _, prepared in evidence:
+            for pre_prepare in prepared:
+                seq = pre_prepare["seq"]
+                if (checkpoint < seq <= checkpoint + PBFT_LOG_WINDOW
+                        and (seq not in certificates or pre_prepare["view"] > certificates[seq]["view"])):
+                    certificates[seq] = pre_prepare
+        planned = []
+        for seq in range(checkpoint + 1, max(certificates, default=checkpoint) + 1):
+            certificate = certificates.get(seq, {"digest": PBFT_NULL_DIGEST, "request": None})
+            planned.append({"type": "PRE-PREPARE", "view": new_view, "seq": seq, "digest": certificate["digest"],
+                            "request": certificate["request"], "replica": self.primary(new_view)})
+        return checkpoint, state, proof, planned
+
+    def on_new_view(self, envelope):
+        body = envelope["body"]
+        new_view = body["view"]
+        if body["replica"] != self.primary(new_view) or new_view < self.view or (new_view == self.view and not self.in_view_change):
+            return
+        votes = [vote for vote in body["view_changes"]
+                 if vote["body"]["type"] == "VIEW-CHANGE" and vote["body"]["view"] == new_view and self.cluster.verify(vote)]
+        if len({vote["body"]["replica"] for vote in votes}) < 2 * self.f + 1:
+            return
+        checkpoint, state, proof, planned = self.plan_new_view(new_view, [vote["body"] for vote in votes])
+        pre_prepares = body["pre_prepares"]
+        if [pre_prepare["body"] for pre_prepare in pre_prepares] != planned or not all(map(self.cluster.verify, pre_prepares)):
+            return  # The new primary did not carry the proven prepared requests over faithfully
+        self.enter_view(new_view, checkpoint, state, proof, pre_prepares)
+
+    def enter_view(self, new_view, checkpoint, state, proof, pre_prepares):
+        self.view = new_view
+        if checkpoint > self.low_watermark:
+            self.stabilize(checkpoint, state, proof)
+        self.in_view_change = False
+        self.cluster.view = max(self.cluster.view, new_view)
+        for log in (self.pre_prepares, self.prepares, self.commits):
+            for key in [key for key in log if key[0] < new_view]:
+                del log[key]
+        for view in [view for view in self.view_changes if view <= new_view]:
+            del self.view_changes[view]
+        self.next_sequence = pre_prepares[-1]["body"]["seq"] if pre_prepares else checkpoint
+        self.assigned = {pre_prepare["body"]["request"]["body"]["request"] for pre_prepare in pre_prepares if pre_prepare["body"]["request"] is not None}
+        for pre_prepare in pre_prepares:
+            self.accept_pre_prepare(pre_prepare)
+        if self.primary(new_view) == self.replica_id:
+            self.assign_sequences()
+        deferred, self.deferred = self.deferred, []
+        for envelope in deferred:
+            self.handle(envelope)
+        self.reset_timer()
+
+# PBFT Cluster Class
+# N replicas on one event loop, each with its own listening socket and Ed25519 key, plus the client side
+# used by the pipeline: requests go to every replica and count as committed once f + 1 replicas send
+# matching signed replies. commit() runs on the cluster's loop; from other threads, start the cluster
+# with run_in_background() and call commit_chunk().
+class PBFTCluster:
+    def __init__(self, replica_count, crashed_replicas=()):
+        self.replica_count = replica_count
+        self.f = (replica_count - 1) // 3
+        signing_keys = [ed25519.Ed25519PrivateKey.generate() for _ in range(replica_count)]
+        self.client_key = ed25519.Ed25519PrivateKey.generate()
+        self.public_keys = {replica_id: key.public_key() for replica_id, key in enumerate(signing_keys)}
+        self.public_keys["client"] = self.client_key.public_key()
+        self.replicas = [PBFTReplica(self, replica_id, key, replica_id in crashed_replicas) for replica_id, key in enumerate(signing_keys)]
+        self.writers = []
+        self.reader_tasks = []
+        self.waiting = {}  # request id -> (future, {(seq, result): replicas})
+        self.next_request = 0
+        self.commit_latencies = []
+        self.messages_sent = 0
+        self.view = 0  # Highest view any replica has entered
+        self.loop = None
+        self.thread = None
+
+    # Function to check a message's signature against its sender's key; requests are signed by the client
+    def verify(self, envelope):
+        body = envelope["body"]
+        try:
+            self.public_keys[body.get("replica", "client")].verify(bytes.fromhex(envelope["signature"]), pbft_payload(body))
+            return True
+        except Exception:
+            return False
+
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        ports = [await replica.start() for replica in self.replicas]
+        for replica in self.replicas:
+            await replica.connect(ports)
+        for port in ports:
+            reader, writer = await asyncio.open_connection(PBFT_HOST, port, limit=PBFT_LINE_LIMIT)
+            self.writers.append(writer)
+            self.reader_tasks.append(asyncio.create_task(self.read_replies(reader)))
+
+    async def read_replies(self, reader):
+        async for line in reader:
+            envelope = json.loads(line)
+            body = envelope["body"]
+            waiting = self.waiting.get(body["request"])
+            if waiting is None or not self.verify(envelope):
+                continue
+            future, replies = waiting
+            replicas = replies.setdefault((body["seq"], body["result"]), set())
+            replicas.add(body["replica"])
+            if len(replicas) > self.f and not future.done():
+                future.set_result((body["seq"], body["view"]))
+
+    # Orders one chunk digest through the cluster; returns (sequence number, view, seconds to commit)
+    async def commit(self, digest):
+        self.next_request += 1
+        request_id = self.next_request
+        request = pbft_envelope(self.client_key, {"type": "REQUEST", "request": request_id, "digest": digest, "timestamp": time.time()})
+        future = self.loop.create_future()
+        self.waiting[request_id] = (future, {})
+        started = time.perf_counter()
+        line = json.dumps(request).encode() + b"\n"
+        for writer in self.writers:
+            writer.write(line)
+        try:
+            seq, view = await future
+        finally:
+            del self.waiting[request_id]
+        latency = time.perf_counter() - started
+        self.commit_latencies.append(latency)
+        return seq, view, latency
+
+    async def close(self):
+        for task in self.reader_tasks:
+            task.cancel()
+        for writer in self.writers:
+            writer.close()
+        await asyncio.gather(*(replica.close() for replica in self.replicas), *self.reader_tasks, return_exceptions=True)
+
+    # Starts the cluster on its own event loop thread; returns once every replica is connected
+    def run_in_background(self):
+        ready = threading.Event()
+
+        def run():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(self.start())
+            ready.set()
+            loop.run_forever()
+            loop.close()
+
+        self.thread = threading.Thread(target=run, name="pbft", daemon=True)
+        self.thread.start()
+        ready.wait()
+
+    # Function to commit a chunk digest from any thread; returns None if the cluster cannot commit it in time
+    def commit_chunk(self, digest):
+        future = asyncio.run_coroutine_threadsafe(self.commit(digest), self.loop)
+        try:
+            return future.result(PBFT_COMMIT_TIMEOUT)
+        except TimeoutError:
+            future.cancel()
+            return None
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self.close(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+pbft_cluster = None  # Created by main when CONSENSUS_COMMIT is "pbft"
+
 # Function to save chunk data to CSV
-def save_chunk_to_csv(filename, chunk_number, chunk_data, node_votes, segments_info, chunk_verification_outcome, true_vote_percentage):
+def save_chunk_to_csv(filename, chunk_number, chunk_text, chunk_size, vote_matrix, segments_info, chunk_verification_outcome, true_vote_percentage):
     with open(filename, 'a', newline='') as file:
         writer = csv.writer(file)
 
@@ -149,117 +1821,283 @@ def save_chunk_to_csv(filename, chunk_number, chunk_data, node_votes, segments_i
         
         # Write the chunk data
         timestamp = datetime.now().timestamp()
-        digital_signature = ','.join(info[2].hex() for info in segments_info)  # Assuming this is how you get the digital signature
-        writer.writerow([chunk_number, timestamp, chunk_data, CHUNK_SIZE, digital_signature, chunk_verification_outcome, f"{true_vote_percentage:.2f}%"])
-
-# Name for the Data Chunk Excel file
-csv_filename = 'chunk_data_records.csv'
-
-# Function to generate matrix table
-def generate_matrix_table(chunk_number, node_votes, segments_info, chunk_verification_outcome, true_vote_percentage):
-    global worksheet, start_row  # Declare start_row as global
-
-    # Write Chunk number for all nodes
-    for i in range(NUMBER_OF_NODES):
-        worksheet.write(start_row + i, 0, f'Chunk {chunk_number}')
-
-    # Write the data for each node
-    for node_id in range(NUMBER_OF_NODES):
-        worksheet.write(start_row + node_id, 1, f'NODE {node_id}')  # Node ID
-
-        # Write True/False for the head segment, middle segments, and tail segment
-        worksheet.write(start_row + node_id, 2, 'True' if node_votes[node_id][0] else 'False')  # Head segment
-        for segment_index, vote in enumerate(node_votes[node_id][1:-1], start=3):  # Middle segments
-            worksheet.write(start_row + node_id, segment_index, 'True' if vote else 'False')
-        worksheet.write(start_row + node_id, 3 + NUMBER_OF_SEGMENTS, 'True' if node_votes[node_id][-1] else 'False')  # Tail segment
-
-        # Write the verification percentage per node
-        positive_votes = node_votes[node_id].count(True)
-        verification_percentage_per_node = (positive_votes / (NUMBER_OF_SEGMENTS + 2)) * 100  # Including head and tail
-        worksheet.write(start_row + node_id, 4 + NUMBER_OF_SEGMENTS, f"{verification_percentage_per_node:.2f}%")
-
-        # Write the verification outcome, size of data received, hashes, signatures, timestamps, and node status
-        worksheet.write(start_row + node_id, 5 + NUMBER_OF_SEGMENTS, chunk_verification_outcome)
-        worksheet.write(start_row + node_id, 6 + NUMBER_OF_SEGMENTS, CHUNK_SIZE)
-        
-        # Combine hashes, signatures, and timestamps from segments_info
-        hashes = ', '.join(info[1] for info in segments_info)
-        signatures = ', '.join(info[2].hex() for info in segments_info)
-        timestamps = ', '.join(str(info[3]) for info in segments_info)
-        worksheet.write(start_row + node_id, 7 + NUMBER_OF_SEGMENTS, hashes)
-        worksheet.write(start_row + node_id, 8 + NUMBER_OF_SEGMENTS, signatures)
-        worksheet.write(start_row + node_id, 9 + NUMBER_OF_SEGMENTS, timestamps)
-        
-        # Determine node status based on the majority vote
-        status = 'GOOD' if positive_votes >= math.ceil((NUMBER_OF_SEGMENTS + 2) * 0.85) else 'FAULTY'
-        worksheet.write(start_row + node_id, 10 + NUMBER_OF_SEGMENTS, status)
+        digital_signature = ','.join(signature.hex() for signature in chunk_signatures(segments_info))
+        writer.writerow([chunk_number, timestamp, chunk_text, chunk_size, digital_signature, chunk_verification_outcome, f"{true_vote_percentage:.2f}%"])
+
+# Function to generate matrix table in the pipeline's worksheet from a tallied vote matrix
+def generate_matrix_table(pipeline, chunk_number, chunk_size, vote_matrix, segments_info, chunk_verification_outcome, true_vote_percentage):
+    worksheet, start_row = pipeline.worksheet, pipeline.start_row
+    node_count = min(vote_matrix.votes.shape[0], NODE_DETAIL_LIMIT)
+    summary_col = 2 + pipeline.segment_count  # Short or content-defined chunks may leave some segment columns empty
+
+    # True/False/SKIPPED for every segment (head segment first and tail segment last), percentage and status per node
+    cast, node_cast_votes = vote_matrix.cast[:node_count], vote_matrix.node_cast_votes[:node_count]
+    abstained = vote_matrix.abstained[:node_count]
+    vote_text = np.where(cast, np.where(vote_matrix.votes[:node_count], 'True', 'False'),
+                         np.where(abstained[:, np.newaxis], 'ABSTAIN', 'SKIPPED')).tolist()
+    percentages = [f"{percentage:.2f}%" if cast_votes else '-' for percentage, cast_votes in zip(vote_matrix.node_percentages[:node_count].tolist(), node_cast_votes.tolist())]
+    statuses = np.where(abstained, 'ABSTAINED', np.where(node_cast_votes == 0, 'SKIPPED',
+                                                         np.where(vote_matrix.node_good[:node_count], 'GOOD', 'FAULTY'))).tolist()
+
+    # Combine hashes, signatures, and timestamps from segments_info; the same for every node
+    hashes = ', '.join(info[1].hex() for info in segments_info)
+    signatures = ', '.join(signature.hex() for signature in chunk_signatures(segments_info))
+    timestamps = ', '.join(str(info[3]) for info in segments_info)
+
+    # Write the data for each node: chunk number, node ID and votes, then the verification percentage,
+    # outcome, size of data received, hashes, signatures, timestamps, and node status
+    for node_id in range(node_count):
+        row = start_row + node_id
+        worksheet.write_row(row, 0, [f'Chunk {chunk_number}', f'NODE {node_id}'] + vote_text[node_id])
+        worksheet.write_row(row, summary_col, [percentages[node_id], chunk_verification_outcome, chunk_size,
+                                               hashes, signatures, timestamps, statuses[node_id]])
 
     # After writing all nodes, increment start_row to skip to the next chunk's start
-    start_row += NUMBER_OF_NODES
+    pipeline.start_row += node_count
 
 
-# Function to process and clear the buffer
-def process_buffer(dht, chunk_number):
-    global DATA_BUFFER, start_row
-    if len(DATA_BUFFER) >= CHUNK_SIZE:
-        chunk_data = DATA_BUFFER[:CHUNK_SIZE]
-        DATA_BUFFER = DATA_BUFFER[CHUNK_SIZE:]
+# Function to process the next chunk from a symbol pipeline
+def process_buffer(dht, pipeline, chunk_number):
+    assembler = pipeline.assembler
+    chunk_label = pipeline.chunk_label(chunk_number)
+    next_chunk = assembler.pop_chunk()
+    if next_chunk is not None:
+        slot, chunk_data, completed_at = next_chunk
+        dispatch_latency = time.perf_counter() - completed_at
+        print(f"{chunk_label} dispatched {dispatch_latency * 1000:.2f} ms after its last byte arrived "
+              f"({assembler.ready_chunks()} more waiting)")
 
         segments_info = segment_data(chunk_data, private_key)
-        node_votes = {node_id: [] for node_id in range(NUMBER_OF_NODES)}
+        vote_matrix = VoteMatrix(len(dht.registry), len(segments_info))
+        collect_votes(dht, segments_info, vote_matrix)
+        vote_matrix.tally()
+        dht.registry.record_votes(vote_matrix)
+        true_vote_percentage = vote_matrix.true_vote_percentage
+        chunk_verification_outcome = 'Verified Successfully' if vote_matrix.passed else 'Verified Unsuccessfully'
 
-        for node_id in range(NUMBER_OF_NODES):
-            for segment_info in segments_info:
-                segment, segment_hash, signature, timestamp = segment_info
-                vote = dht.nodes[node_id].vote(segment, segment_hash, public_key, signature, timestamp)
-                node_votes[node_id].append(vote)
+        # Output to the terminal in one write so concurrent workers do not interleave
+        report = [f"{chunk_label} Processing Results:"]
+        listed_nodes = min(len(dht.registry), NODE_DETAIL_LIMIT)
+        for node_id, (votes, cast_votes) in enumerate(zip(vote_matrix.votes[:listed_nodes].tolist(), vote_matrix.node_cast_votes[:listed_nodes].tolist())):
+            if vote_matrix.abstained[node_id]:
+                report.append(f"Node {node_id} Votes: abstained")
+            else:
+                report.append(f"Node {node_id} Votes: {votes[:cast_votes]}" if cast_votes else f"Node {node_id} Votes: skipped")
+        if listed_nodes < len(dht.registry):
+            report.append(f"... {len(dht.registry) - listed_nodes} more nodes")
+        if vote_matrix.abstained.any():
+            report.append(f"{chunk_label} {int(vote_matrix.abstained.sum())} nodes abstained (missed the {VOTE_DEADLINE * 1000:.0f} ms vote deadline)")
+        report.append(f"{chunk_label} segments with a node quorum: {int(vote_matrix.segment_quorum.sum())} of {len(segments_info)}")
+        if EARLY_TERMINATION:
+            # Votes computed past the point of decision (the rest of a node's, or of a bulk block) count as cast, not skipped
+            skipped = vote_matrix.total_votes - vote_matrix.decided_after if AUDIT_VOTES else vote_matrix.skipped_votes
+            report.append(f"{chunk_label} outcome fixed after {vote_matrix.decided_after} of {vote_matrix.total_votes} votes, "
+                          f"{skipped} {'would be skipped (audit)' if AUDIT_VOTES else 'skipped'}")
+        report.append(f"{chunk_label} {chunk_verification_outcome} ({true_vote_percentage:.2f}% true votes)")
+        if pbft_cluster is not None and vote_matrix.passed:
+            committed = pbft_cluster.commit_chunk(hashlib.sha256(chunk_data).hexdigest())
+            if committed is None:
+                report.append(f"{chunk_label} not committed by the PBFT cluster within {PBFT_COMMIT_TIMEOUT} s")
+            else:
+                seq, view, latency = committed
+                report.append(f"{chunk_label} committed by the PBFT cluster at sequence {seq} in view {view} ({latency * 1000:.2f} ms)")
+        print("\n".join(report) + "\n", end="")
 
-        total_true_votes = sum(vote for votes in node_votes.values() for vote in votes)
-        true_vote_percentage = (total_true_votes / TOTAL_VOTES) * 100
-        chunk_verification_outcome = 'Verified Successfully' if total_true_votes >= MIN_APPROVALS else 'Verified Unsuccessfully'
+        # Generate Data Chunk Table and Matrix Table
+        with workbook_lock:
+            open_output_sinks()
+            report_first_chunk(completed_at)
+        save_chunk_to_csv(pipeline.csv_filename, chunk_number, pipeline.chunk_text(slot, chunk_data), len(chunk_data), vote_matrix, segments_info, chunk_verification_outcome, true_vote_percentage)
+        with workbook_lock:
+            generate_matrix_table(pipeline, chunk_number, len(chunk_data), vote_matrix, segments_info, chunk_verification_outcome, true_vote_percentage)
 
-        # Output to the terminal
-        print(f"Chunk {chunk_number} Processing Results:")
-        for node_id, votes in node_votes.items():
-            print(f"Node {node_id} Votes: {votes}")
-        print(f"Chunk {chunk_number} {chunk_verification_outcome} ({true_vote_percentage:.2f}% true votes)")
+        # Hand the slot back to the assembler; the segment views above are invalid after this
+        assembler.release(slot)
 
-        # Generate Data Chunk Table and Matrix Table
-        save_chunk_to_csv(csv_filename, chunk_number, chunk_data, node_votes, segments_info, chunk_verification_outcome, true_vote_percentage)
-        generate_matrix_table(chunk_number, node_votes, segments_info, chunk_verification_outcome, true_vote_percentage)
-        
-        # Clear the DATA_BUFFER for the next chunk
-        DATA_BUFFER = DATA_BUFFER[CHUNK_SIZE:]
-
-# Function to check buffer size periodically
-def check_buffer_size(dht):
-    global exit_flag
-    chunk_number = 1
-    while not exit_flag and chunk_number <= NUMBER_OF_CHUNKS:
-        if len(DATA_BUFFER) >= CHUNK_SIZE:
-            process_buffer(dht, chunk_number)
-            if chunk_number == NUMBER_OF_CHUNKS:
-                exit_flag = True  # Set exit flag to ensure main program exits
-                break
-            chunk_number += 1
-        else:
-            print(f"Waiting for enough data for Chunk {chunk_number}...")
-        time.sleep(BUFFER_CHECK_FREQUENCY)
-    print("Exiting buffer check thread.")
+# Function to claim the oldest ready chunk of any idle pipeline; returns (pipeline, chunk_number), or None on timeout or shutdown
+def claim_ready_chunk(timeout):
+    deadline = time.monotonic() + timeout
+    with chunk_ready:
+        while not exit_event.is_set():
+            for pipeline in pipelines.values():
+                if not pipeline.busy and pipeline.chunks_claimed < pipeline.chunk_limit and pipeline.assembler.ready_chunks():
+                    pipeline.busy = True
+                    pipeline.chunks_claimed += 1
+                    return pipeline, pipeline.chunks_claimed
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            chunk_ready.wait(remaining)
+        return None
 
-# Binance WebSocket message processing function
-def process_binance_message(ws_message):
-    global DATA_BUFFER
+# Function to mark a pipeline idle again; returns True once every pipeline has reached its chunk limit
+def finish_chunk(pipeline):
+    with chunk_ready:
+        pipeline.busy = False
+        chunk_ready.notify_all()
+        return all(p.chunks_claimed >= p.chunk_limit and not p.busy for p in pipelines.values())
+
+# Dispatcher worker: verifies each chunk as soon as it is assembled, for whichever symbol it belongs to
+def dispatch_chunks(dht, worker_id):
+    while not exit_event.is_set():
+        claimed = claim_ready_chunk(BUFFER_CHECK_FREQUENCY)
+        if claimed is None:
+            if worker_id == 0 and not exit_event.is_set():
+                for pipeline in pipelines.values():
+                    if pipeline.chunks_claimed < pipeline.chunk_limit:
+                        print(f"Waiting for enough data for {pipeline.chunk_label(pipeline.chunks_claimed + 1)}...")
+            continue
+
+        pipeline, chunk_number = claimed
+        try:
+            process_buffer(dht, pipeline, chunk_number)
+        finally:
+            all_done = finish_chunk(pipeline)
+        if all_done:
+            request_shutdown()  # Ensure main program exits once all chunks are processed
+    print(f"Exiting dispatcher thread {worker_id}.")
+
+# Function to block until no pipeline has a chunk in flight or waiting to be claimed
+def wait_until_idle():
+    def idle():
+        return not any(p.busy or (p.assembler.ready_chunks() and p.chunks_claimed < p.chunk_limit) for p in pipelines.values())
+    with chunk_ready:
+        chunk_ready.wait_for(lambda: exit_event.is_set() or idle())
+
+# Function to request a graceful exit from any thread
+def request_shutdown():
+    exit_event.set()
+    for pipeline in pipelines.values():
+        pipeline.assembler.close()
+    for callback in shutdown_callbacks:
+        callback()
+
+# Function to decode a trade frame with json.loads; works for any frame shape.
+# Returns (symbol, trade_id, event_time, price, quantity) or None if the frame carries no price.
+def decode_trade_json(ws_message):
     message_data = json.loads(ws_message)
-    if 'p' in message_data:
-        DATA_BUFFER += message_data['p']
+    if 'data' in message_data:  # Combined streams wrap each event as {"stream": ..., "data": {...}}
+        message_data = message_data['data']
+    if 'p' not in message_data:
+        return None
+    return message_data.get('s', ''), message_data.get('t'), message_data.get('E'), message_data['p'], message_data.get('q')
+
+# Function to pull the trade fields straight out of a Binance trade frame without building a dict.
+# Binance sends the fields in a fixed order (e, E, s, t, p, q, ...), so one precompiled pattern picks
+# them out in a single scan. Trade id and event time stay digit strings; callers convert them only when
+# needed. Returns None if the frame does not match that schema, so the caller can fall back to json.loads.
+TRADE_FRAME_PATTERN = re.compile(r'"e":"trade","E":(\d+),"s":"([^"]*)","t":(\d+),"p":"([^"]*)","q":"([^"]*)"')
+
+def decode_trade_fast(ws_message):
+    match = TRADE_FRAME_PATTERN.search(ws_message)
+    if match is None:
+        return None
+    event_time, symbol, trade_id, price, quantity = match.groups()
+    return symbol, trade_id, event_time, price, quantity
+
+# Function to decode a trade frame, using the fast path when it recognises the frame
+def decode_trade(ws_message):
+    if isinstance(ws_message, bytes):
+        ws_message = ws_message.decode()
+    trade = decode_trade_fast(ws_message) if FAST_TRADE_DECODER else None
+    return trade if trade is not None else decode_trade_json(ws_message)
 
-    else:        
+# Binance WebSocket message processing function
+def process_binance_message(ws_message):
+    trade = decode_trade(ws_message)
+    if trade is None:
         print("No price field in the received message.")
+        return
+
+    symbol, trade_id, event_time, price, quantity = trade
+    symbol = symbol.lower() if MULTI_SYMBOL_MODE else SYMBOLS[0]
+    pipeline = pipelines.get(symbol)
+    if pipeline is None:
+        print(f"No pipeline for symbol {symbol!r} in the received message.")
+    elif CHUNK_FORMAT == "trades":
+        if None in (trade_id, event_time, quantity):
+            print("Incomplete trade fields in the received message.")
+        else:
+            pipeline.add_trade(int(trade_id), int(event_time), to_fixed_point(price), to_fixed_point(quantity))
+    else:
+        pipeline.assembler.append(price.encode())
+
+# Feed Recorder Class
+# Appends raw frames to a compact append-only log. Each record is an 8-byte wall-clock timestamp in
+# nanoseconds and a 4-byte frame length (FRAME_HEADER), followed by the frame bytes as received.
+FRAME_HEADER = struct.Struct("<qI")
+
+class FeedRecorder:
+    def __init__(self, filename):
+        self.filename = filename
+        self.frames_recorded = 0
+        self._file = open(filename, 'ab')
+
+    def record(self, message):
+        if isinstance(message, str):
+            message = message.encode()
+        self._file.write(FRAME_HEADER.pack(time.time_ns(), len(message)))
+        self._file.write(message)
+        self.frames_recorded += 1
+
+    def close(self):
+        self._file.close()
+        print(f"Recorded {self.frames_recorded} frames to {self.filename}")
+
+feed_recorder = None  # Set in main() when RECORD_FEED_TO is configured
+
+# Function to read a feed recording back as (timestamp_ns, frame) pairs
+def read_feed_recording(filename):
+    with open(filename, 'rb') as file:
+        while True:
+            header = file.read(FRAME_HEADER.size)
+            if len(header) < FRAME_HEADER.size:
+                return
+            timestamp_ns, length = FRAME_HEADER.unpack(header)
+            frame = file.read(length)
+            if len(frame) < length:
+                return  # Partial last frame from an interrupted recording
+            yield timestamp_ns, frame
+
+# Function to feed a recording through process_binance_message, paced by the recorded timestamps
+def replay_feed(filename, speed):
+    frames_replayed = 0
+    bytes_replayed = 0
+    first_timestamp_ns = None
+    replay_start = time.perf_counter()
+    for timestamp_ns, frame in read_feed_recording(filename):
+        if exit_event.is_set():
+            break
+        if speed > 0:
+            if first_timestamp_ns is None:
+                first_timestamp_ns = timestamp_ns
+            delay = (timestamp_ns - first_timestamp_ns) / 1e9 / speed - (time.perf_counter() - replay_start)
+            if delay > 0:
+                exit_event.wait(delay)
+        process_binance_message(frame)
+        frames_replayed += 1
+        bytes_replayed += len(frame)
+
+    elapsed = max(time.perf_counter() - replay_start, 1e-9)
+    print(f"Replayed {frames_replayed} frames ({bytes_replayed} bytes) in {elapsed:.3f} s: {frames_replayed / elapsed:.0f} frames/s read "
+          f"(verification throughput is reported once every chunk is processed)")
+
+# Function to print the handoff counters of every pipeline
+def report_queue_stats():
+    for pipeline in pipelines.values():
+        stats = pipeline.assembler.stats()
+        print(f"{pipeline.symbol.upper()} queue: depth {stats['depth']}, max depth {stats['max_depth']}, "
+              f"dropped {stats['dropped']}, spilled {stats['spilled']}, producer blocked {stats['blocked_seconds']:.3f} s")
+
+# Function to handle one raw frame from any live exchange connection
+def handle_feed_message(message):
+    if feed_recorder is not None:
+        feed_recorder.record(message)
+    process_binance_message(message)
 
 # Binance WebSocket event handlers
 def on_message(ws, message):
-    process_binance_message(message)
+    handle_feed_message(message)
 
 def on_error(ws, error):
     print("Error:", error)
@@ -270,36 +2108,647 @@ def on_close(ws, close_status_code, close_msg):
 def on_open(ws):
     print("WebSocket connection opened to Binance")
 
-# Set up Binance WebSocket connection and run client
-binance_ws_url = "wss://stream.binance.com:9443/ws/btcusdt@trade"
-ws = websocket.WebSocketApp(binance_ws_url, on_message=on_message, on_error=on_error, on_close=on_close)
+# Function to build the trade stream URL: a raw stream for one symbol, or one combined stream for every symbol
+def exchange_stream_url(base_url):
+    if MULTI_SYMBOL_MODE:
+        return f"{base_url}/stream?streams=" + "/".join(f"{symbol}@trade" for symbol in SYMBOLS)
+    return f"{base_url}/ws/{SYMBOLS[0]}@trade"
+
+# Synthetic Exchange
+# Local stand-in for the Binance trade stream for load testing. It serves /ws/<symbol>@trade and
+# /stream?streams=<symbol>@trade/... like Binance and emits Binance-shaped trade events at
+# SYNTHETIC_RATE, shaped by the burst pattern, delivery latency and drop rate settings.
 
-dht = DHT(public_key)
-# Implementing Threading
-ws_thread = threading.Thread(target=ws.run_forever)
-ws_thread.start()
+# Function to give the target message rate at a time offset into a connection
+def synthetic_rate(elapsed):
+    phase = (elapsed % SYNTHETIC_BURST_PERIOD) / SYNTHETIC_BURST_PERIOD
+    if SYNTHETIC_BURST_PATTERN == "square":
+        return SYNTHETIC_RATE * SYNTHETIC_BURST_FACTOR if phase < 0.5 else SYNTHETIC_RATE / SYNTHETIC_BURST_FACTOR
+    if SYNTHETIC_BURST_PATTERN == "spike":
+        return SYNTHETIC_RATE * SYNTHETIC_BURST_FACTOR if phase < 0.1 else SYNTHETIC_RATE
+    return SYNTHETIC_RATE
 
-# Implementing Buffer Threads
-buffer_thread = threading.Thread(target=lambda: check_buffer_size(dht))
-buffer_thread.start()
+# Synthetic Trade Generator Class
+# Random-walk prices and per-symbol trade ids, formatted directly as Binance trade event JSON
+class SyntheticTradeGenerator:
+    def __init__(self, symbols, combined):
+        self.symbols = [symbol.upper() for symbol in symbols]
+        self.combined = combined
+        self.prices = {symbol: random.uniform(1, 50000) for symbol in self.symbols}
+        self.trade_ids = {symbol: 0 for symbol in self.symbols}
+        self.frames_generated = 0
 
-# Main loop for keeping the script running
-try:
+    def next_frame(self):
+        symbol = self.symbols[self.frames_generated % len(self.symbols)]
+        self.frames_generated += 1
+        self.trade_ids[symbol] += 1
+        price = self.prices[symbol] = self.prices[symbol] * (1 + random.gauss(0, 0.0001))
+        now_ms = time.time_ns() // 1_000_000
+        buyer_is_maker = 'true' if random.random() < 0.5 else 'false'
+        trade = (f'{{"e":"trade","E":{now_ms},"s":"{symbol}","t":{self.trade_ids[symbol]},'
+                 f'"p":"{price:.8f}","q":"{random.uniform(0.0001, 2):.8f}","T":{now_ms},"m":{buyer_is_maker},"M":true}}')
+        if self.combined:
+            return f'{{"stream":"{symbol.lower()}@trade","data":{trade}}}'
+        return trade
 
+# Sends queued frame batches once their simulated delivery time has come
+async def deliver_synthetic_frames(connection, deliveries, stats):
     while True:
-        if exit_flag:
-            break
-        time.sleep(0.1)
-except KeyboardInterrupt:
-    print("Exiting program...")
-    exit_flag = True
+        due, batch = await deliveries.get()
+        delay = due - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        for frame in batch:
+            await connection.send(frame)
+        stats['sent'] += len(batch)
+
+# Handles one client connection to the synthetic exchange
+async def synthetic_exchange_handler(connection):
+    url = urllib.parse.urlsplit(connection.request.path)
+    combined = url.path.startswith("/stream")
+    if combined:
+        streams = urllib.parse.parse_qs(url.query).get("streams", [""])[0].split("/")
+    else:
+        streams = [url.path.rsplit("/", 1)[-1]]
+    symbols = [stream.split("@")[0] for stream in streams if stream] or [SYMBOLS[0]]
+    generator = SyntheticTradeGenerator(symbols, combined)
+
+    stats = {'sent': 0, 'dropped': 0}
+    deliveries = asyncio.Queue(maxsize=10000)  # Bounded, so a slow client pushes back on generation
+    sender = asyncio.create_task(deliver_synthetic_frames(connection, deliveries, stats))
+    start = last_tick = time.perf_counter()
+    budget = 0.0
+    try:
+        while not sender.done():
+            await asyncio.sleep(SYNTHETIC_TICK)
+            now = time.perf_counter()
+            budget += synthetic_rate(now - start) * (now - last_tick)
+            last_tick = now
+            count = int(budget)
+            budget -= count
+
+            batch = []
+            for _ in range(count):
+                frame = generator.next_frame()
+                if SYNTHETIC_DROP_RATE and random.random() < SYNTHETIC_DROP_RATE:
+                    stats['dropped'] += 1
+                else:
+                    batch.append(frame)
+            if batch:
+                due = now + SYNTHETIC_LATENCY + random.uniform(0, SYNTHETIC_LATENCY_JITTER)
+                deliveries.put_nowait((due, batch))
+
+            # A client that cannot keep up pauses generation instead of growing the backlog
+            if deliveries.full():
+                while deliveries.full() and not sender.done():
+                    await asyncio.sleep(SYNTHETIC_TICK)
+                last_tick = time.perf_counter()
+    finally:
+        sender.cancel()
+        elapsed = time.perf_counter() - start
+        print(f"Synthetic exchange: sent {stats['sent']} frames in {elapsed:.1f} s "
+              f"({stats['sent'] / elapsed:.0f} msg/s), dropped {stats['dropped']}")
+
+async def serve_synthetic_exchange(ready=None):
+    async with websockets.serve(synthetic_exchange_handler, SYNTHETIC_HOST, SYNTHETIC_PORT):
+        print(f"Synthetic exchange listening on ws://{SYNTHETIC_HOST}:{SYNTHETIC_PORT}")
+        if ready is not None:
+            ready.set()
+        await asyncio.Future()
+
+# Function to run the synthetic exchange on a background thread; returns once it is accepting connections
+def start_synthetic_exchange():
+    ready = threading.Event()
+    threading.Thread(target=lambda: asyncio.run(serve_synthetic_exchange(ready)), daemon=True).start()
+    ready.wait()
+
+# Asyncio ingestion engine: consumes one exchange stream on the shared event loop, reconnecting on failure
+async def consume_stream(url, connections):
+    while not exit_event.is_set():
+        try:
+            async with websockets.connect(url) as exchange_ws:
+                connections.add(exchange_ws)
+                print(f"WebSocket connection opened to {url}")
+                try:
+                    async for message in exchange_ws:
+                        handle_feed_message(message)
+                finally:
+                    connections.discard(exchange_ws)
+            print("WebSocket closed")
+        except (OSError, websockets.exceptions.WebSocketException) as error:
+            print("Error:", error)
+        if not exit_event.is_set():
+            await asyncio.sleep(RECONNECT_DELAY)
+
+# Runs every subscription on one event loop until shutdown is requested
+async def run_ingestion(urls):
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    wake = lambda: loop.call_soon_threadsafe(stop.set)
+    shutdown_callbacks.append(wake)
+    if exit_event.is_set():
+        stop.set()
+
+    connections = set()
+    tasks = [asyncio.create_task(consume_stream(url, connections)) for url in urls]
+    try:
+        await stop.wait()
+    finally:
+        # Close open sockets cleanly, then cancel anything still connecting or backing off
+        await asyncio.gather(*(exchange_ws.close() for exchange_ws in list(connections)))
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        shutdown_callbacks.remove(wake)
+
+# Runs the websocket-client app on its own thread until shutdown is requested
+def run_threaded_ingestion(url):
+    import websocket  # Deferred: websocket-client is only needed by the "thread" ingestion engine
+    ws = websocket.WebSocketApp(url, on_open=on_open, on_message=on_message, on_error=on_error, on_close=on_close)
+    ws_thread = threading.Thread(target=ws.run_forever)
+    ws_thread.start()
+    try:
+        exit_event.wait()
+    finally:
+        ws.close()
+        ws_thread.join()
+
+# Sliding Window Class
+# Keeps the items seen in the last `seconds` seconds. Each timestamp is parsed once on arrival and
+# entries are kept in arrival order, so eviction only ever pops from the left: O(1) amortized per item
+# instead of rebuilding the whole buffer on every check.
+class SlidingWindow:
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self._entries = deque()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def append(self, timestamp, item):
+        self._entries.append((timestamp, item))
+        self.evict(timestamp)
+
+    def evict(self, now):
+        cutoff = now - self.seconds
+        while self._entries and self._entries[0][0] < cutoff:
+            self._entries.popleft()
+
+    def items(self):
+        return [item for _, item in self._entries]
+
+# In-Process Broker
+# A minimal stand-in for a Kafka broker with the confluent_kafka produce/poll interface, so the Kafka
+# source can run and be tested without a cluster. Topics are append-only lists; consumers track offsets.
+class BrokerMessage:
+    def __init__(self, topic, offset, value, timestamp_ms):
+        self._topic = topic
+        self._offset = offset
+        self._value = value
+        self._timestamp_ms = timestamp_ms
+
+    def topic(self):
+        return self._topic
+
+    def offset(self):
+        return self._offset
+
+    def value(self):
+        return self._value
+
+    def timestamp(self):
+        return 1, self._timestamp_ms  # (TIMESTAMP_CREATE_TIME, milliseconds) like confluent_kafka
+
+    def error(self):
+        return None
+
+class InProcessBroker:
+    def __init__(self):
+        self._topics = {}
+        self._condition = threading.Condition()
+
+    def produce(self, topic, value, timestamp_ms=None):
+        if isinstance(value, str):
+            value = value.encode()
+        with self._condition:
+            messages = self._topics.setdefault(topic, [])
+            messages.append(BrokerMessage(topic, len(messages), value, timestamp_ms or time.time_ns() // 1_000_000))
+            self._condition.notify_all()
+
+    def consumer(self, config):
+        return InProcessConsumer(self, config)
+
+class InProcessConsumer:
+    def __init__(self, broker, config):
+        self._broker = broker
+        self._from_latest = config.get('auto.offset.reset') == 'latest'
+        self._offsets = {}
+
+    def subscribe(self, topics):
+        with self._broker._condition:
+            for topic in topics:
+                start = len(self._broker._topics.get(topic, [])) if self._from_latest else 0
+                self._offsets.setdefault(topic, start)
+
+    def _next_message(self):
+        for topic, offset in self._offsets.items():
+            messages = self._broker._topics.get(topic, [])
+            if offset < len(messages):
+                self._offsets[topic] = offset + 1
+                return messages[offset]
+        return None
+
+    def poll(self, timeout):
+        with self._broker._condition:
+            message = self._next_message()
+            if message is None and self._broker._condition.wait(timeout):
+                message = self._next_message()
+            return message
+
+    def close(self):
+        self._offsets.clear()
+
+in_process_broker = InProcessBroker()
+
+# Function to publish synthetic trades to the in-process broker at SYNTHETIC_RATE until shutdown
+def produce_synthetic_trades(broker, topic):
+    generator = SyntheticTradeGenerator(SYMBOLS if MULTI_SYMBOL_MODE else SYMBOLS[:1], MULTI_SYMBOL_MODE)
+    start = time.perf_counter()
+    while not exit_event.is_set():
+        due = int((time.perf_counter() - start) * SYNTHETIC_RATE) - generator.frames_generated
+        for _ in range(due):
+            broker.produce(topic, generator.next_frame())
+        exit_event.wait(SYNTHETIC_TICK)
+
+# Data Sources
+# Every source feeds raw frames to handle_feed_message from run(), which blocks on the main thread
+# until the source is exhausted or shutdown is requested. DATA_SOURCE picks one in create_data_source().
+
+# Live exchange WebSocket stream on either ingestion engine
+class ExchangeWebSocketSource:
+    def __init__(self, url, engine):
+        self.url = url
+        self.engine = engine
+
+    def run(self):
+        if self.engine == "asyncio":
+            asyncio.run(run_ingestion([self.url]))
+        else:
+            run_threaded_ingestion(self.url)
+
+# Recorded feed log, paced by its timestamps
+class ReplaySource:
+    def __init__(self, filename, speed):
+        self.filename = filename
+        self.speed = speed
+
+    def run(self):
+        replay_feed(self.filename, self.speed)
+
+# Text file with one frame per line, read as fast as possible
+class FileSource:
+    def __init__(self, filename):
+        self.filename = filename
+
+    def run(self):
+        with open(self.filename, 'rb') as file:
+            for line in file:
+                if exit_event.is_set():
+                    break
+                line = line.strip()
+                if line:
+                    handle_feed_message(line)
+
+# Kafka-style log consumer; also keeps a sliding window of recent messages keyed by their broker timestamps
+class KafkaSource:
+    def __init__(self, consumer, topic, window_seconds):
+        self.consumer = consumer
+        self.topic = topic
+        self.window = SlidingWindow(window_seconds)
+
+    def run(self):
+        self.consumer.subscribe([self.topic])
+        next_report = time.monotonic() + WINDOW_REPORT_INTERVAL
+        try:
+            while not exit_event.is_set():
+                message = self.consumer.poll(KAFKA_POLL_TIMEOUT)
+                if message is not None and message.error():
+                    print("Error:", message.error())
+                elif message is not None:
+                    self.window.append(message.timestamp()[1] / 1000, message.value())
+                    handle_feed_message(message.value())
+
+                if time.monotonic() >= next_report:
+                    self.window.evict(time.time())
+                    print(f"Live window: {len(self.window)} messages in the last {self.window.seconds} s")
+                    next_report += WINDOW_REPORT_INTERVAL
+        finally:
+            self.consumer.close()
+
+# Memory-mapped file; its chunks are already available to the dispatchers through MappedFileChunks
+class MappedFileSource:
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def run(self):
+        print(f"Verifying {self.chunks.filename}: {self.chunks.size} bytes in {self.chunks.total_chunks} chunks of {self.chunks.chunk_size} bytes")
+
+# Function to build the configured data source
+def create_data_source():
+    if DATA_SOURCE == "mmap":
+        return MappedFileSource(pipelines[MAPPED_FILE].assembler)
+    if DATA_SOURCE == "replay":
+        return ReplaySource(REPLAY_FROM, REPLAY_SPEED)
+    if DATA_SOURCE == "file":
+        return FileSource(FRAMES_FILE)
+    if DATA_SOURCE == "kafka":
+        if KAFKA_CONFIG['bootstrap.servers'] == "in-process":
+            threading.Thread(target=produce_synthetic_trades, args=(in_process_broker, KAFKA_TOPIC), daemon=True).start()
+            consumer = in_process_broker.consumer(KAFKA_CONFIG)
+        else:
+            from confluent_kafka import Consumer  # Optional dependency, only needed for a real broker
+            consumer = Consumer(KAFKA_CONFIG)
+        return KafkaSource(consumer, KAFKA_TOPIC, WINDOW_SECONDS)
+
+    if SYNTHETIC_EXCHANGE == "embedded":
+        start_synthetic_exchange()
+        return ExchangeWebSocketSource(exchange_stream_url(f"ws://{SYNTHETIC_HOST}:{SYNTHETIC_PORT}"), INGESTION_ENGINE)
+    return ExchangeWebSocketSource(exchange_stream_url(BINANCE_WS_BASE), INGESTION_ENGINE)
+
+# Benchmarks
+
+# Function to load frames for benchmarks: a feed recording if there is one, otherwise synthetic trades
+def load_benchmark_frames():
+    if Path(BENCHMARK_FRAMES_FROM).exists():
+        frames = [frame.decode() for _, frame in read_feed_recording(BENCHMARK_FRAMES_FROM)]
+        print(f"Loaded {len(frames)} recorded frames from {BENCHMARK_FRAMES_FROM}")
+    else:
+        generator = SyntheticTradeGenerator(SYMBOLS if MULTI_SYMBOL_MODE else SYMBOLS[:1], MULTI_SYMBOL_MODE)
+        frames = [generator.next_frame() for _ in range(BENCHMARK_FRAME_COUNT)]
+        print(f"Generated {len(frames)} synthetic frames (no recording at {BENCHMARK_FRAMES_FROM})")
+    return frames
+
+# Compares the fast-path trade decoder with json.loads on the same frames
+def benchmark_decoder():
+    frames = load_benchmark_frames()
+    def normalised(trade):
+        symbol, trade_id, event_time, price, quantity = trade
+        return symbol, int(trade_id), int(event_time), price, quantity
+
+    fast_trades = [decode_trade_fast(frame) for frame in frames]
+    fallbacks = fast_trades.count(None)
+    mismatches = sum(1 for frame, trade in zip(frames, fast_trades) if trade is not None and normalised(trade) != decode_trade_json(frame))
+    print(f"Fast path: {fallbacks} frames fell back to json.loads, {mismatches} decoded differently")
+
+    timings = {}
+    for name, decode in (("json.loads", decode_trade_json), ("fast path", decode_trade_fast)):
+        timings[name] = min(timeit.repeat(lambda: [decode(frame) for frame in frames], number=1, repeat=5))
+        print(f"{name:>10}: {timings[name] / len(frames) * 1e6:.3f} us/frame ({len(frames) / timings[name]:,.0f} frames/s)")
+    print(f"Speedup: {timings['json.loads'] / timings['fast path']:.2f}x")
+
+# Compares segmentation strategies: segments and byte coverage per chunk, and the CPU cost of hashing
+# and signing one chunk, per segment and by Merkle root (signing estimated from one measured signature)
+def benchmark_segmentation():
+    load_crypto()
+    segment_hash = hashlib.sha256(b"").digest()
+    sign_seconds = min(timeit.repeat(lambda: signature_scheme.sign(private_key, segment_hash), number=5, repeat=3)) / 5
+    for chunk_length in (CHUNK_SIZE, FILE_CHUNK_SIZE):
+        chunk = memoryview(os.urandom(chunk_length))
+        print(f"Chunk size {chunk_length} bytes:")
+        for name in SEGMENTATION_STRATEGIES:
+            strategy = SEGMENTATION_STRATEGIES[name]
+            if isinstance(strategy, GearChunker):
+                plan_segments = lambda: strategy.cut_points(chunk)  # Rolling-hash scan over every byte of every chunk
+            else:
+                plan_segments = lambda: segment_offset_plan(name, chunk_length)
+            plan = plan_segments()
+            covered = sum(end - start for start, end in plan) - sum(max(previous[1] - start, 0) for previous, (start, _) in zip(plan, plan[1:]))
+            # Plan and hash are timed together, as segment_data pays for both on every chunk
+            repeats = 1 if isinstance(strategy, GearChunker) and chunk_length > CHUNK_SIZE else 10
+            plan_seconds = min(timeit.repeat(plan_segments, number=repeats, repeat=3)) / repeats
+            hash_seconds = min(timeit.repeat(lambda: [hashlib.sha256(chunk[start:end]).digest() for start, end in plan_segments()],
+                                             number=repeats, repeat=3)) / repeats
+            merkle_seconds = min(timeit.repeat(lambda: build_merkle_tree([bytes(32)] * len(plan)), number=10, repeat=3)) / 10
+            print(f"  {name:>15}: {len(plan):6d} segments, {covered / chunk_length * 100:6.2f}% coverage, "
+                  f"plan + hash {hash_seconds * 1e6:11.1f} us (plan {plan_seconds * 1e6:11.1f} us), "
+                  f"hash + sign {(hash_seconds + len(plan) * sign_seconds) * 1000:10.2f} ms per chunk, "
+                  f"Merkle root {(hash_seconds + merkle_seconds + sign_seconds) * 1000:8.2f} ms")
+
+# Compares signature schemes: sign and verify throughput on segment-sized digests, and the chunk rate each
+# allows when one signer signs every segment and every node verifies every segment
+def benchmark_signatures():
+    digest = hashlib.sha256(b"segment").digest()
+    segments = len(segment_offset_plan("head_tail", CHUNK_SIZE))
+    print(f"{segments} signed segments per chunk, {NUMBER_OF_NODES} verifying nodes")
+    for name, scheme_class in SIGNATURE_SCHEMES.items():
+        scheme = scheme_class()
+        key = scheme.generate_private_key()
+        signature = scheme.sign(key, digest)
+        verify_key = key.public_key()
+        sign_seconds = min(timeit.repeat(lambda: scheme.sign(key, digest), number=20, repeat=3)) / 20
+        verify_seconds = min(timeit.repeat(lambda: scheme.verify(verify_key, signature, digest), number=20, repeat=3)) / 20
+        chunk_seconds = segments * (sign_seconds + NUMBER_OF_NODES * verify_seconds)
+        print(f"{name:>10}: sign {1 / sign_seconds:9,.0f}/s, verify {1 / verify_seconds:9,.0f}/s, "
+              f"{len(signature):3d}-byte signatures, signer alone {1 / (segments * sign_seconds):8,.1f} chunks/s, "
+              f"with verification {1 / chunk_seconds:8,.1f} chunks/s")
+
+# Measures the crypto executor speedup curve on the pipeline's own path: chunks are segmented and signed
+# by segment_data and voted on by collect_votes one at a time, as a single symbol's dispatcher handles
+# them, inline and on process and thread pools of growing size
+def benchmark_crypto_executor():
+    global crypto_executor
+    load_crypto()
+    dht = DHT(public_key)
+    chunk_count = 64
+
+    def run():
+        chunks = [os.urandom(CHUNK_SIZE) for _ in range(chunk_count)]  # Fresh data, so no run reuses cached checks
+        start = time.perf_counter()
+        for chunk in chunks:
+            segments_info = segment_data(chunk, private_key)
+            collect_votes(dht, segments_info, VoteMatrix(len(dht.registry), len(segments_info)))
+        return time.perf_counter() - start
+
+    inline_seconds = run()
+    print(f"{chunk_count} chunks of {CHUNK_SIZE} bytes, {NUMBER_OF_NODES} nodes, {VERIFICATION_MODE} verification on {os.cpu_count()} CPUs")
+    print(f"    inline: {inline_seconds:.3f} s ({chunk_count / inline_seconds:8,.1f} chunks/s)")
+    for kind in ("process", "thread"):
+        for workers in sorted({1, 2, 4, 8, os.cpu_count() or 1}):
+            crypto_executor = CryptoExecutor(kind, workers, CRYPTO_BATCH_SIZE)
+            seconds = run()
+            crypto_executor.shutdown()
+            print(f"{kind:>7} x{workers:<2}: {seconds:.3f} s ({chunk_count / seconds:8,.1f} chunks/s, {inline_seconds / seconds:.2f}x)")
+    crypto_executor = None
+
+# Per-segment cost of signing once and verifying on every node, comparing fresh padding and hash objects
+# with the digest hashed again inside each operation against the reusable Prehashed context, at 10, 100
+# and 1000 verifying nodes
+def benchmark_crypto_context():
+    scheme = RSAPSSScheme()
+    key = scheme.generate_private_key()
+    verify_key = key.public_key()
+    segment = os.urandom(64)
+
+    def fresh_objects(nodes):
+        digest = hashlib.sha256(segment).digest()
+        signature = key.sign(digest, padding.PSS(mgf=padding.MGF1(hashes.SHA256()), salt_length=padding.PSS.MAX_LENGTH), hashes.SHA256())
+        for _ in range(nodes):
+            verify_key.verify(signature, hashlib.sha256(segment).digest(),
+                              padding.PSS(mgf=padding.MGF1(hashes.SHA256()), salt_length=padding.PSS.MAX_LENGTH), hashes.SHA256())
+
+    def reused_context(nodes):
+        digest = hashlib.sha256(segment).digest()
+        signature = scheme.sign(key, digest)
+        for _ in range(nodes):
+            scheme.verify(verify_key, signature, hashlib.sha256(segment).digest())
+
+    for nodes in (10, 100, 1000):
+        repeats = max(1000 // nodes, 3)
+        fresh_seconds = min(timeit.repeat(lambda: fresh_objects(nodes), number=repeats, repeat=3)) / repeats
+        context_seconds = min(timeit.repeat(lambda: reused_context(nodes), number=repeats, repeat=3)) / repeats
+        print(f"{nodes:5d} nodes: fresh objects {fresh_seconds * 1000:8.3f} ms/segment, reused Prehashed context "
+              f"{context_seconds * 1000:8.3f} ms/segment, saving {(fresh_seconds - context_seconds) * 1e6:7.1f} us "
+              f"({(1 - context_seconds / fresh_seconds) * 100:4.1f}%)")
+
+# Measures how the min_approvals outcome and the cost of voting behave as the node count grows: bulk voting
+# for each fault model up to 100k nodes, then the per-node engine on the same chunk for comparison
+def benchmark_node_scale():
+    load_crypto()
+    segments_info = segment_data(os.urandom(CHUNK_SIZE), private_key)
+    key_id = public_key_id(public_key)
+    print(f"{len(segments_info)} segments per chunk, {FAULTY_PROPORTION * 100:.1f}% faulty nodes")
+    for fault_model in FAULT_MODELS:
+        for node_count in (10, 100, 1000, 10000, 100000):
+            registry = NodeRegistry(node_count, math.floor(node_count * FAULTY_PROPORTION), fault_model)
+            vote_matrix = VoteMatrix(node_count, len(segments_info))
+            start = time.perf_counter()
+            vote_matrix.votes[:] = registry.bulk_vote(segments_info, public_key, key_id)
+            vote_matrix.cast[:] = True
+            vote_matrix.tally()
+            seconds = time.perf_counter() - start
+            needed = min_approvals(vote_matrix.total_votes)
+            print(f"{fault_model:>8} {node_count:7d} nodes: {vote_matrix.total_true_votes:8d} of {vote_matrix.total_votes:8d} True, "
+                  f"{needed:8d} needed (margin {(vote_matrix.total_true_votes - needed) / vote_matrix.total_votes * 100:+6.2f}%), "
+                  f"{'pass' if vote_matrix.passed else 'FAIL'}, bulk {seconds * 1000:8.2f} ms/chunk")
+    for node_count in (10, 100, 1000, 10000):
+        registry = NodeRegistry(node_count, math.floor(node_count * FAULTY_PROPORTION), "random")
+        nodes = [registry.node(node_id) for node_id in range(node_count)]
+        start = time.perf_counter()
+        for node in nodes:
+            [node.vote(segment, segment_hash, public_key, signature, timestamp, merkle_proof, key_id)
+             for segment, segment_hash, signature, timestamp, merkle_proof in segments_info]
+        print(f"per-node {node_count:7d} nodes: {(time.perf_counter() - start) * 1000:8.2f} ms/chunk")
+
+# Commit latency and throughput of the PBFT cluster against its size: chunks committed one at a time for
+# latency, then PBFT_PIPELINE_DEPTH at a time for chunks/s, with every replica up and again with the
+# first primary crashed so the first request has to wait out a round change
+def benchmark_pbft():
+    async def measure(replica_count, crashed_replicas):
+        cluster = PBFTCluster(replica_count, crashed_replicas)
+        await cluster.start()
+        digests = [hashlib.sha256(os.urandom(32)).hexdigest() for _ in range(PBFT_BENCHMARK_CHUNKS)]
+        for digest in digests:
+            await cluster.commit(digest)
+        latencies = np.array(cluster.commit_latencies) * 1000
+        window = asyncio.Semaphore(PBFT_PIPELINE_DEPTH)
+
+        async def pipelined_commit(digest):
+            async with window:
+                await cluster.commit(digest)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(pipelined_commit(digest) for digest in digests))
+        seconds = time.perf_counter() - start
+        messages = cluster.messages_sent / (2 * len(digests))
+        await cluster.close()
+        print(f"{replica_count:3d} replicas (f = {cluster.f}){' primary down' if crashed_replicas else '             '}: "
+              f"latency p50 {np.percentile(latencies, 50):7.2f} ms, p99 {np.percentile(latencies, 99):8.2f} ms, "
+              f"max {latencies.max():8.2f} ms; {len(digests) / seconds:7.1f} chunks/s pipelined; "
+              f"{messages:6.0f} messages/chunk; view {cluster.view}")
+
+    print(f"{PBFT_BENCHMARK_CHUNKS} chunks per run, {PBFT_PIPELINE_DEPTH} in flight when pipelined, {os.cpu_count()} CPUs")
+    for replica_count in PBFT_BENCHMARK_REPLICAS:
+        asyncio.run(measure(replica_count, ()))
+        asyncio.run(measure(replica_count, (0,)))
+
+benchmarks = {"decoder": benchmark_decoder, "segmentation": benchmark_segmentation, "signatures": benchmark_signatures,
+              "crypto_executor": benchmark_crypto_executor, "crypto_context": benchmark_crypto_context, "node_scale": benchmark_node_scale,
+              "pbft": benchmark_pbft}
+
+def main():
+    global feed_recorder, crypto_executor, node_vote_pool, node_vote_loop, pbft_cluster
+    if BENCHMARK:
+        benchmarks[BENCHMARK]()
+        return
+
+    if SYNTHETIC_EXCHANGE == "serve":
+        try:
+            asyncio.run(serve_synthetic_exchange())
+        except KeyboardInterrupt:
+            print("Exiting program...")
+        return
+
+    pipelines.update(create_pipelines())
+    load_crypto()
+    dht = DHT(public_key)
+    if CRYPTO_EXECUTOR:
+        crypto_executor = CryptoExecutor(CRYPTO_EXECUTOR, CRYPTO_WORKERS, CRYPTO_BATCH_SIZE)
+    if VOTING_ENGINE == "parallel":
+        node_vote_pool = ThreadPoolExecutor(NODE_VOTE_WORKERS, thread_name_prefix="node-vote")
+        node_vote_loop = start_node_vote_loop()
+    if CONSENSUS_COMMIT == "pbft":
+        pbft_cluster = PBFTCluster(PBFT_REPLICAS, PBFT_CRASHED_REPLICAS)
+        pbft_cluster.run_in_background()
+    if RECORD_FEED_TO and DATA_SOURCE != "replay":
+        feed_recorder = FeedRecorder(RECORD_FEED_TO)
+
+    # Implementing Dispatcher Threads, shared by every symbol pipeline
+    buffer_threads = [threading.Thread(target=dispatch_chunks, args=(dht, worker_id)) for worker_id in range(DISPATCH_WORKERS)]
+    for buffer_thread in buffer_threads:
+        buffer_thread.start()
+
+    # Ingest on the main thread until the dispatchers finish, the source runs dry or the user interrupts
+    source = create_data_source()
+    run_start = time.perf_counter()
+    try:
+        source.run()
+        if not exit_event.is_set():
+            wait_until_idle()  # Finite source exhausted: let consensus catch up
+    except KeyboardInterrupt:
+        print("Exiting program...")
+    elapsed = time.perf_counter() - run_start
+    chunks_processed = sum(p.chunks_claimed for p in pipelines.values())
+    print(f"Processed {chunks_processed} chunks in {elapsed:.3f} s ({chunks_processed / elapsed:.2f} chunks/s)")
+
+    # Wait for the dispatchers to finish
+    request_shutdown()
+    for buffer_thread in buffer_threads:
+        buffer_thread.join()
+    for pipeline in pipelines.values():
+        pipeline.assembler.close()  # No chunk is in use any more: releases mapped files
+    report_queue_stats()
+    report_node_stats(dht.registry)
+    report_response_times(dht.registry)
+    if pbft_cluster is not None:
+        report_pbft_stats(pbft_cluster)
+        pbft_cluster.stop()
+    if node_vote_pool is not None:
+        node_vote_loop.call_soon_threadsafe(node_vote_loop.stop)
+        node_vote_pool.shutdown(cancel_futures=True)
+    if crypto_executor is not None:
+        crypto_executor.shutdown()
+    if REUSE_SIGNATURES:
+        print(f"Segment signatures reused: {signature_cache.hits} of {signature_cache.hits + signature_cache.misses}")
+    if VERIFICATION_MODE == "shared":
+        print(f"Signature checks reused: {verification_cache.hits} of {verification_cache.hits + verification_cache.misses}")
+    if feed_recorder is not None:
+        feed_recorder.close()
 
-# Close WebSocket and wait for threads to finish
-ws.close()
-buffer_thread.join()
-ws_thread.join()
+    print("Program exited gracefully.")
 
-print("Program exited gracefully.")
+    # Do not forget to close the workbook after processing all chunks
+    if workbook is not None:
+        workbook.close()
 
-# Do not forget to close the workbook after processing all chunks
-workbook.close()
+if __name__ == "__main__":
+    main()